@@ -0,0 +1 @@
+"""Benchmarks of the overhead of the scikeras wrappers."""
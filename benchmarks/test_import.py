@@ -0,0 +1,31 @@
+"""Benchmarks of the time it takes to import scikeras.
+
+Each import runs in a fresh interpreter, since modules are cached.
+"""
+import subprocess
+import sys
+
+import pytest
+
+
+def _run(code):
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+@pytest.mark.benchmark(group="import")
+def test_import_python(benchmark):
+    """Baseline: starting the interpreter."""
+    benchmark.pedantic(_run, args=("pass",), rounds=5)
+
+
+@pytest.mark.benchmark(group="import")
+def test_import_wrappers(benchmark):
+    """TensorFlow is not imported."""
+    benchmark.pedantic(_run, args=("import scikeras.wrappers",), rounds=5)
+
+
+@pytest.mark.benchmark(group="import")
+def test_import_tensorflow(benchmark):
+    """Importing scikeras along with TensorFlow, as on first fit."""
+    code = "import scikeras.wrappers, tensorflow.keras"
+    benchmark.pedantic(_run, args=(code,), rounds=5)
@@ -0,0 +1,123 @@
+"""Benchmarks of the wrappers' `fit`, `predict`, pickling and cloning.
+
+The models are kept small so that timings are dominated by the wrappers
+rather than by TensorFlow's compute. See CONTRIBUTING.md for how to run
+and compare benchmarks.
+"""
+import pickle
+
+import numpy as np
+import pytest
+
+from sklearn.base import clone
+
+from scikeras.wrappers import KerasClassifier, KerasRegressor
+from tests.mlp_models import dynamic_classifier, dynamic_regressor
+
+
+N_SAMPLES = 1000
+N_FEATURES = 20
+N_OUTPUTS = 3
+N_CLASSES = 5
+
+TARGET_TYPES = [
+    "binary",
+    "multiclass",
+    "multilabel-indicator",
+    "multiclass-multioutput",
+    "continuous",
+    "continuous-multioutput",
+]
+
+
+def make_data(target_type, n_samples=N_SAMPLES):
+    """Random features and targets of the given sklearn target type."""
+    rng = np.random.RandomState(0)
+    X = rng.uniform(size=(n_samples, N_FEATURES)).astype(np.float32)
+    y = {
+        "binary": lambda: rng.randint(2, size=n_samples),
+        "multiclass": lambda: rng.randint(N_CLASSES, size=n_samples),
+        "multilabel-indicator": lambda: rng.randint(2, size=(n_samples, N_OUTPUTS)),
+        "multiclass-multioutput": lambda: rng.randint(
+            N_CLASSES, size=(n_samples, N_OUTPUTS)
+        ),
+        "continuous": lambda: rng.normal(size=n_samples),
+        "continuous-multioutput": lambda: rng.normal(size=(n_samples, N_OUTPUTS)),
+    }[target_type]()
+    return X, y
+
+
+def make_estimator(target_type, **kwargs):
+    if target_type.startswith("continuous"):
+        wrapper, build_fn = KerasRegressor, dynamic_regressor
+    else:
+        wrapper, build_fn = KerasClassifier, dynamic_classifier
+    if target_type == "multiclass-multioutput":
+        # outputs are ordinal encoded
+        kwargs.setdefault("loss", "sparse_categorical_crossentropy")
+    return wrapper(build_fn, model__hidden_layer_sizes=(32,), verbose=0, **kwargs)
+
+
+@pytest.fixture(scope="module", params=TARGET_TYPES)
+def target_type(request):
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def data(target_type):
+    return make_data(target_type)
+
+
+@pytest.fixture(scope="module")
+def fitted(target_type, data):
+    return make_estimator(target_type).fit(*data)
+
+
+@pytest.mark.benchmark(group="fit")
+@pytest.mark.parametrize("batch_size", [32, 256])
+def test_fit(benchmark, target_type, data, batch_size):
+    estimator = make_estimator(target_type, batch_size=batch_size)
+    benchmark.pedantic(estimator.fit, args=data, rounds=5, warmup_rounds=1)
+
+
+@pytest.mark.benchmark(group="partial_fit")
+def test_partial_fit(benchmark, target_type, data):
+    """Repeated fits of the same model, without building it."""
+    if target_type in ("multilabel-indicator", "multiclass-multioutput"):
+        pytest.skip("Histories of multi-output models can not be merged yet.")
+    estimator = make_estimator(target_type, batch_size=256).fit(*data)
+    benchmark.pedantic(estimator.partial_fit, args=data, rounds=5, warmup_rounds=1)
+
+
+@pytest.mark.benchmark(group="predict")
+@pytest.mark.parametrize("n_samples", [1, 32, N_SAMPLES])
+@pytest.mark.parametrize("fast", [False, True])
+def test_predict(benchmark, fitted, data, n_samples, fast):
+    X = data[0][:n_samples]
+    benchmark(fitted.predict, X, fast=fast)
+
+
+@pytest.mark.benchmark(group="predict_proba")
+@pytest.mark.parametrize("n_samples", [1, N_SAMPLES])
+def test_predict_proba(benchmark, fitted, data, n_samples):
+    if not hasattr(fitted, "predict_proba"):
+        pytest.skip("Regressors do not implement `predict_proba`.")
+    X = data[0][:n_samples]
+    benchmark(fitted.predict_proba, X)
+
+
+@pytest.mark.benchmark(group="pickle")
+def test_pickle_roundtrip(benchmark, fitted):
+    benchmark(lambda: pickle.loads(pickle.dumps(fitted)))
+
+
+@pytest.mark.benchmark(group="clone")
+@pytest.mark.parametrize("is_fitted", [False, True])
+def test_clone(benchmark, target_type, fitted, is_fitted):
+    estimator = fitted if is_fitted else make_estimator(target_type)
+    benchmark(clone, estimator)
+
+
+@pytest.mark.benchmark(group="get_meta")
+def test_get_meta(benchmark, fitted):
+    benchmark(fitted.get_meta)
@@ -0,0 +1,46 @@
+"""Keras callbacks used by the wrappers.
+
+Importing this module imports TensorFlow.
+"""
+import time
+
+import tensorflow as tf
+
+
+class TrainingBudget(tf.keras.callbacks.Callback):
+    """Stops training once a wall-clock or step budget is exhausted.
+
+    Budgets are checked after each batch and count from the start of
+    each call to `Model.fit`.
+
+    Parameters
+    ----------
+    max_time_s : float, default None
+        Maximum training time, in seconds.
+    max_steps : int, default None
+        Maximum number of batches to train on, across epochs.
+    """
+
+    def __init__(self, max_time_s: float = None, max_steps: int = None):
+        super().__init__()
+        self.max_time_s = max_time_s
+        self.max_steps = max_steps
+
+    def on_train_begin(self, logs=None):
+        self._start = time.perf_counter()
+        self._steps = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._steps += 1
+        self._check()
+
+    def on_epoch_end(self, epoch, logs=None):
+        # in case stopping mid-epoch is not supported
+        self._check()
+
+    def _check(self):
+        if (self.max_steps is not None and self._steps >= self.max_steps) or (
+            self.max_time_s is not None
+            and time.perf_counter() - self._start >= self.max_time_s
+        ):
+            self.model.stop_training = True
@@ -0,0 +1,102 @@
+"""Deferred imports of TensorFlow, which takes seconds to import.
+
+The TensorFlow modules used by scikeras are `LazyModule` proxies,
+imported when one of their attributes is first used, that is when
+a model is built, trained, used for predictions, pickled or unpickled.
+Creating estimators, `get_params`, `set_params`, `clone` and pickling
+unfitted estimators do not import TensorFlow.
+"""
+import importlib
+import sys
+import threading
+
+
+_setup_lock = threading.RLock()
+_is_setup = False
+_keras_serializables = []
+
+
+class LazyModule:
+    """Proxy of the module `name`, imported on first attribute access.
+
+    Attributes are cached on the proxy once read, so that subsequent
+    accesses cost the same as for the module itself.
+    """
+
+    def __init__(self, name: str):
+        self._lazy_name = name
+
+    def __getattr__(self, attr):
+        # only called for attributes that are not cached yet
+        module = _import(self._lazy_name)
+        value = getattr(module, attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self):
+        return "<lazy module {!r}>".format(self._lazy_name)
+
+
+tf = LazyModule("tensorflow")
+
+
+def _import(name: str):
+    """Imports the module `name`, setting up Keras the first time."""
+    module = importlib.import_module(name)
+    if not _is_setup:
+        _setup_keras()
+    return module
+
+
+def _setup_keras():
+    """Patches and registers objects in Keras, once."""
+    global _is_setup
+    with _setup_lock:
+        if _is_setup:
+            return
+        from tensorflow.python import keras
+        from tensorflow.python.keras.utils.generic_utils import (
+            register_keras_serializable as register,
+        )
+
+        # Monkey patch log_cosh reference
+        # See https://github.com/tensorflow/tensorflow/pull/42097
+        # Will be removed whenever the
+        # min supported version of tf incorporates the fix
+        keras.metrics.log_cosh = keras.metrics.logcosh
+
+        for func in _keras_serializables:
+            register()(func)
+        _is_setup = True
+
+
+def register_keras_serializable():
+    """Deferred equivalent of Keras' `register_keras_serializable`.
+
+    Functions are registered when TensorFlow is imported by scikeras,
+    before any model is built, serialized or deserialized.
+    """
+
+    def decorator(func):
+        with _setup_lock:
+            _keras_serializables.append(func)
+            if _is_setup:
+                from tensorflow.python.keras.utils.generic_utils import (
+                    register_keras_serializable as register,
+                )
+
+                register()(func)
+        return func
+
+    return decorator
+
+
+def is_keras_model(obj) -> bool:
+    """Checks if `obj` is a Keras Model without importing TensorFlow."""
+    # models can only exist once TensorFlow was imported
+    return "tensorflow" in sys.modules and isinstance(obj, tf.keras.Model)
+
+
+if "tensorflow" in sys.modules:
+    # already paid for, keep Keras objects available to user code
+    _setup_keras()
@@ -1,23 +1,39 @@
 import inspect
+import itertools
 import os
+import pickle
 import random
+import threading
+import time
 import warnings
+import weakref
 
+from collections import OrderedDict
 from inspect import isclass
-from typing import Any, Callable, Dict, Iterable, List, Type, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
 import numpy as np
-import tensorflow as tf
+import scipy.sparse as sp
 
 from sklearn.base import BaseEstimator, TransformerMixin
-from tensorflow.keras import losses as losses_module
-from tensorflow.keras import metrics as metrics_module
-from tensorflow.keras import optimizers as optimizers_module
-from tensorflow.keras.layers import deserialize as deserialize_layer
-from tensorflow.keras.layers import serialize as serialize_layer
-from tensorflow.keras.metrics import deserialize as deserialize_metric
-from tensorflow.keras.models import Model
-from tensorflow.python.keras.saving import saving_utils
+from sklearn.utils import gen_batches
+from sklearn.utils.validation import _num_samples
+
+from ._lazy import LazyModule, tf
+
+
+saving_utils = LazyModule("tensorflow.python.keras.saving.saving_utils")
 
 
 class TFRandomState:
@@ -79,21 +95,134 @@ class LabelDimensionTransformer(TransformerMixin, BaseEstimator):
         return X
 
 
-def unpack_keras_model(model, training_config, weights):
+class OneHotTargets:
+    """Class indices, one-hot encoded when indexed.
+
+    Stands in for the `(n_samples, n_classes)` one-hot targets of
+    categorical crossentropy losses, which are then only materialized
+    one batch at a time (see `BaseWrapper._gather_batches`).
+
+    Parameters
+    ----------
+    labels : np.ndarray of shape (n_samples,)
+        Class indices, in `range(n_classes)`.
+    n_classes : int
+        Number of classes.
+    """
+
+    dtype = np.dtype(np.uint8)
+
+    def __init__(self, labels: np.ndarray, n_classes: int):
+        self.labels = labels
+        self.n_classes = n_classes
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (self.labels.shape[0], self.n_classes)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the one-hot targets, if materialized."""
+        return self.labels.shape[0] * self.n_classes * self.dtype.itemsize
+
+    def __len__(self):
+        return self.labels.shape[0]
+
+    def __getitem__(self, idx) -> np.ndarray:
+        labels = self.labels[idx]
+        out = np.zeros((labels.shape[0], self.n_classes), dtype=self.dtype)
+        out[np.arange(labels.shape[0]), labels] = 1
+        return out
+
+    def toarray(self) -> np.ndarray:
+        """Returns all the one-hot targets."""
+        return self[:]
+
+
+# serializes updates of timings, ex: by threads predicting concurrently
+_timings_lock = threading.Lock()
+
+
+class PhaseTimer:
+    """Context manager adding the time spent in its block to
+    `timings[phase]`, which may be shared by several threads.
+
+    Parameters
+    ----------
+    timings : dict
+        Total time spent in each phase, in seconds.
+    phase : str
+        Name of the timed phase.
+    hook : callable, default None
+        Called as `hook(phase, seconds)` when the block exits.
+    """
+
+    __slots__ = ("timings", "phase", "hook", "_start")
+
+    def __init__(self, timings: Dict[str, float], phase: str, hook: Callable = None):
+        self.timings = timings
+        self.phase = phase
+        self.hook = hook
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self._start
+        with _timings_lock:
+            self.timings[self.phase] = self.timings.get(self.phase, 0.0) + elapsed
+        if self.hook is not None:
+            self.hook(self.phase, elapsed)
+
+
+class _NotTimed:
+    """Context manager doing nothing, used when profiling is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+
+NOT_TIMED = _NotTimed()
+
+
+def unpack_keras_model(model, training_config, weights, weights_layout=None):
     """Creates a new Keras model object using the input
     parameters.
 
+    Arguments:
+        model: serialized model.
+        training_config: training config of compiled models, or None.
+        weights: list of weight arrays, or a buffer of all
+            weights concatenated if `weights_layout` is given.
+        weights_layout: list of `(dtype, shape)` of the weights
+            in `weights`, if `weights` is a buffer.
+
     Returns
     -------
     Model
         A copy of the input Keras Model,
         compiled if the original was compiled.
     """
-    restored_model = deserialize_layer(model)
+    restored_model = tf.keras.layers.deserialize(model)
     if training_config is not None:
         restored_model.compile(
             **saving_utils.compile_args_from_training_config(training_config)
         )
+    if weights_layout is not None:
+        # views into the buffer, set_weights does the only copy
+        buffer, weights, offset = memoryview(weights), [], 0
+        for dtype, shape in weights_layout:
+            weight = np.frombuffer(
+                buffer, dtype=dtype, count=int(np.prod(shape)), offset=offset
+            )
+            weights.append(weight.reshape(shape))
+            offset += weight.nbytes
     restored_model.set_weights(weights)
     restored_model.__reduce_ex__ = pack_keras_model.__get__(restored_model)
     return restored_model
@@ -102,9 +231,14 @@ def unpack_keras_model(model, training_config, weights):
 def pack_keras_model(model_obj, protocol):
     """Pickle a Keras Model.
 
+    With pickle protocol 5 or higher, weights are packed into a single
+    contiguous buffer wrapped in a `pickle.PickleBuffer`, which
+    allows out-of-band (zero-copy) transfers. Otherwise they are pickled
+    as a list of arrays.
+
     Arguments:
         model_obj: an instance of a Keras Model.
-        protocol: pickle protocol version, ignored.
+        protocol: pickle protocol version.
 
     Returns
     -------
@@ -113,9 +247,25 @@ def pack_keras_model(model_obj, protocol):
     """
     model_metadata = saving_utils.model_metadata(model_obj)
     training_config = model_metadata.get("training_config", None)
-    model = serialize_layer(model_obj)
-    weights = model_obj.get_weights()
-    return (unpack_keras_model, (model, training_config, weights))
+    model = tf.keras.layers.serialize(model_obj)
+    if protocol < 5 or not hasattr(pickle, "PickleBuffer"):
+        weights = model_obj.get_weights()
+        return (unpack_keras_model, (model, training_config, weights))
+    # read one weight at a time to avoid holding two copies of all of them
+    layout = [
+        (np.dtype(w.dtype.as_numpy_dtype), tuple(w.shape)) for w in model_obj.weights
+    ]
+    nbytes = [dtype.itemsize * int(np.prod(shape)) for dtype, shape in layout]
+    buffer = np.empty(sum(nbytes), dtype=np.uint8)
+    offset = 0
+    for w, n in zip(model_obj.weights, nbytes):
+        value = np.ascontiguousarray(tf.keras.backend.get_value(w))
+        buffer[offset : offset + n] = value.view(np.uint8).reshape(-1)
+        offset += n
+    return (
+        unpack_keras_model,
+        (model, training_config, pickle.PickleBuffer(buffer), layout),
+    )
 
 
 def make_model_picklable(model_obj):
@@ -132,6 +282,77 @@ def make_model_picklable(model_obj):
     model_obj.__reduce_ex__ = pack_keras_model.__get__(model_obj)
 
 
+class ModelCache:
+    """Thread-safe LRU cache of compiled Keras models that are not in use,
+    keyed by architecture.
+
+    Each entry holds a model along with the weights it was built with
+    and the config of its optimizer, so that it can be reset before reuse.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of cached models, the least recently cached
+        models are evicted first.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def push(self, key: bytes, entry: tuple):
+        """Adds a `(model, weights, optimizer_config)` entry."""
+        with self._lock:
+            self._entries[(key, next(self._counter))] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key: bytes) -> Union[tuple, None]:
+        """Removes and returns the most recent entry for `key`, if any."""
+        with self._lock:
+            for token in reversed(self._entries):
+                if token[0] == key:
+                    return self._entries.pop(token)
+        return None
+
+    def resize(self, maxsize: int):
+        """Sets `maxsize`, evicting the least recently cached entries."""
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0, got {}".format(maxsize))
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def reset_optimizer(model, config: dict):
+    """Replaces the optimizer of a compiled Keras model by a new one
+    created from `config`, that is in its initial state.
+
+    The training function traced by Keras refers to the previous optimizer,
+    it is discarded and traced again by the next call to `fit`.
+
+    Parameters
+    ----------
+    model : Model
+        Compiled Keras model.
+    config : dict
+        Config of the optimizer as it was created.
+    """
+    model.optimizer = model.optimizer.__class__.from_config(config)
+    model.train_function = None
+
+
 def get_metric_full_name(name: str) -> str:
     """Get aliases for Keras losses and metrics.
 
@@ -152,22 +373,232 @@ def get_metric_full_name(name: str) -> str:
     if name == "loss":
         # may be passed "loss" from training history
         return name
-    return getattr(deserialize_metric(name), "__name__")
+    return getattr(tf.keras.metrics.deserialize(name), "__name__")
 
 
 def _windows_upcast_ints(
-    arr: Union[List[np.ndarray], np.ndarray]
-) -> Union[List[np.ndarray], np.ndarray]:
+    arr: Union[List[np.ndarray], Dict[str, np.ndarray], np.ndarray]
+) -> Union[List[np.ndarray], Dict[str, np.ndarray], np.ndarray]:
     # see tensorflow/probability#886
     def _upcast(x):
         return x.astype("int64") if x.dtype == np.int32 else x
 
-    if isinstance(arr, np.ndarray):
+    if isinstance(arr, np.ndarray) or sp.issparse(arr):
         return _upcast(arr)
+    elif isinstance(arr, dict):
+        return {key: _upcast(x_) for key, x_ in arr.items()}
     else:
         return [_upcast(x_) for x_ in arr]
 
 
+def _frame_columns(X) -> Optional[Tuple[list, list]]:
+    """Returns the column names and columns of `X` if it is a pandas
+    DataFrame or a pyarrow Table or RecordBatch, and None otherwise.
+    """
+    if hasattr(X, "iloc") and hasattr(X, "columns") and getattr(X, "ndim", 0) == 2:
+        # pandas.DataFrame, columns are selected by position
+        # since their names may not be unique
+        return list(X.columns), [X.iloc[:, i] for i in range(X.shape[1])]
+    if hasattr(X, "column_names") and hasattr(X, "num_rows"):
+        # pyarrow.Table or pyarrow.RecordBatch
+        return list(X.column_names), list(X.columns)
+    return None
+
+
+def _read_frame(X, columns: list, dtype) -> np.ndarray:
+    """Reads the columns of a data frame into a single 2D array.
+
+    Parameters
+    ----------
+    X : pandas.DataFrame or pyarrow.Table
+        Data frame.
+    columns : list
+        Columns of `X`, as returned by `_frame_columns`.
+    dtype : numpy dtype
+        Dtype of the array if the columns are not all of the same numeric
+        dtype.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape `(n_rows, n_columns)`. pandas DataFrames whose
+        columns share one numeric dtype are returned as-is, without copying
+        their data. Otherwise, each column is copied once, directly into
+        the array, without going through an object array for columns
+        of mixed dtypes.
+    """
+    frame_dtypes = set(getattr(X, "dtypes", ()))
+    if len(frame_dtypes) == 1:
+        frame_dtype = frame_dtypes.pop()
+        if isinstance(frame_dtype, np.dtype) and frame_dtype.kind in "biuf":
+            # pandas.DataFrame holding a single block
+            return np.asarray(X)
+    # views of numeric columns, no copy
+    columns = [np.asarray(column) for column in columns]
+    dtypes = {column.dtype for column in columns}
+    if len(dtypes) == 1 and next(iter(dtypes)).kind in "biuf":
+        dtype = dtypes.pop()
+    out = np.empty((len(X), len(columns)), dtype=dtype)
+    for i, column in enumerate(columns):
+        out[:, i] = column
+    return out
+
+
+def _is_multi_input(X) -> bool:
+    """Checks if `X` holds the inputs of a multi-input model, that is
+    a dict of array-likes keyed by input name.
+
+    Lists and tuples are always single array-likes (ex: a list of samples),
+    as they were before dicts were supported.
+    """
+    # dok_matrix is a dict
+    return isinstance(X, dict) and not sp.issparse(X)
+
+
+def _flatten_inputs(X) -> list:
+    """Returns the list of inputs held by `X`, see `_is_multi_input`."""
+    if not _is_multi_input(X):
+        return [X]
+    return list(X.values())
+
+
+def _map_inputs(func: Callable, X, *others):
+    """Applies `func` to each input of `X` and the matching inputs of
+    `others`, which have the same structure as `X`.
+
+    Parameters
+    ----------
+    func : callable
+        Function taking one input of `X` and one of each of `others`.
+    X : array-like, or dict of array-likes
+        Input(s), see `_is_multi_input`.
+    *others
+        Inputs with the same structure as `X`.
+
+    Returns
+    -------
+    Outputs of `func`, in a dict with the keys of `X` if `X` is a dict
+    of inputs, or as is otherwise.
+    """
+    if not _is_multi_input(X):
+        return func(X, *others)
+    return {key: func(X[key], *(other[key] for other in others)) for key in X}
+
+
+def _iter_chunks(X, chunk_size: Union[None, int]):
+    """Iterate over chunks of samples.
+
+    Parameters
+    ----------
+    X : iterable of array-like or array-like
+        Chunks of samples, or a single array-like (or dict, list or tuple
+        of array-likes for multi-input models) if `chunk_size` is given.
+    chunk_size : int or None
+        If given, `X` is sliced along its first axis into chunks of
+        `chunk_size` samples (the last chunk may be smaller).
+
+    Yields
+    ------
+    array-like
+        Chunks of samples.
+    """
+    if chunk_size is None:
+        yield from X
+        return
+    for batch in gen_batches(_num_samples(_flatten_inputs(X)[0]), chunk_size):
+        # DataFrames are sliced by position
+        yield _map_inputs(lambda arr: getattr(arr, "iloc", arr)[batch], X)
+
+
+def _lists_to_tuples(structure):
+    """Recursively converts lists to tuples, since `tf.data` treats
+    lists as tensors and not as nested structures.
+    """
+    if isinstance(structure, (list, tuple)):
+        return tuple(_lists_to_tuples(s) for s in structure)
+    return structure
+
+
+def _sparse_to_coo(arr):
+    """Returns the components of a `tf.SparseTensor` holding the sparse
+    matrix `arr`, in the canonical row-major order.
+    """
+    arr = arr.tocsr()
+    if not arr.has_sorted_indices:
+        arr = arr.sorted_indices()
+    arr = arr.tocoo()
+    indices = np.column_stack((arr.row, arr.col)).astype(np.int64)
+    return indices, arr.data, np.array(arr.shape, dtype=np.int64)
+
+
+def _dataset_from_batches(batches: Callable, example) -> "tf.data.Dataset":
+    """Create a `tf.data.Dataset` from a generator function of batches.
+
+    Parameters
+    ----------
+    batches : callable
+        Generator function yielding (nested structures of) numpy arrays
+        or SciPy sparse matrices.
+        It is called once per epoch.
+    example : nested structure of numpy arrays or SciPy sparse matrices
+        Batch with the same structure, dtypes and trailing dimensions
+        as those yielded by `batches`.
+
+    Returns
+    -------
+    tf.data.Dataset
+        Dataset yielding the batches, without materializing them.
+        Sparse matrices are yielded as `tf.SparseTensor`, one batch
+        at a time, and are never densified.
+        It is sharded by batch under multi-worker distribution strategies.
+    """
+    example = _lists_to_tuples(example)
+    is_sparse = [sp.issparse(arr) for arr in tf.nest.flatten(example)]
+
+    output_types, output_shapes = [], []
+    for arr, sparse in zip(tf.nest.flatten(example), is_sparse):
+        if sparse:
+            # generated as COO components, see `_sparse_to_coo`
+            output_types.append((tf.int64, tf.as_dtype(arr.dtype), tf.int64))
+            output_shapes.append(
+                (
+                    tf.TensorShape((None, 2)),
+                    tf.TensorShape((None,)),
+                    tf.TensorShape((2,)),
+                )
+            )
+        else:
+            output_types.append(tf.as_dtype(arr.dtype))
+            output_shapes.append(tf.TensorShape((None,) + arr.shape[1:]))
+
+    def generator():
+        for batch in batches():
+            yield tuple(
+                _sparse_to_coo(arr) if sparse else arr
+                for arr, sparse in zip(
+                    tf.nest.flatten(_lists_to_tuples(batch)), is_sparse
+                )
+            )
+
+    def pack(*flat):
+        flat = [
+            tf.SparseTensor(*arr) if sparse else arr
+            for arr, sparse in zip(flat, is_sparse)
+        ]
+        return tf.nest.pack_sequence_as(example, flat)
+
+    dataset = tf.data.Dataset.from_generator(
+        generator, output_types=tuple(output_types), output_shapes=tuple(output_shapes)
+    ).map(pack)
+    # a generator has no files to shard, workers of a multi-worker
+    # distribution strategy each keep a share of the batches instead
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = (
+        tf.data.experimental.AutoShardPolicy.DATA
+    )
+    return dataset.with_options(options)
+
+
 def route_params(
     params: Dict[str, Any],
     destination: str,
@@ -239,53 +670,148 @@ def accepts_kwargs(func: Callable) -> bool:
     )
 
 
+class BuildFnSignature(NamedTuple):
+    """Which of the arguments passed by the wrappers a model building
+    function accepts.
+    """
+
+    meta: bool
+    compile_kwargs: bool
+    params: bool
+
+
+_build_fn_signatures = weakref.WeakKeyDictionary()
+
+
+def get_build_fn_signature(func: Callable) -> BuildFnSignature:
+    """Memoized introspection of a model building function.
+
+    Results are cached until `func` is garbage collected.
+
+    Parameters
+    ----------
+    func : Callable
+        Model building function or bound method.
+
+    Returns
+    -------
+    BuildFnSignature
+        Whether `func` accepts `meta`, `compile_kwargs` and `params`.
+    """
+    # bound methods are re-created on each attribute access
+    key = getattr(func, "__func__", func)
+    try:
+        return _build_fn_signatures[key]
+    except (KeyError, TypeError):
+        pass
+    kwargs = accepts_kwargs(func)
+    signature = BuildFnSignature(
+        meta=kwargs or has_param(func, "meta"),
+        compile_kwargs=kwargs or has_param(func, "compile_kwargs"),
+        params=kwargs or has_param(func, "params"),
+    )
+    try:
+        _build_fn_signatures[key] = signature
+    except TypeError:
+        # can't be weakly referenced
+        pass
+    return signature
+
+
+class RoutingTrie:
+    """Parameters grouped by routing prefix, ex: `{"metrics__0__name": "acc"}`
+    becomes a `metrics` node with a `0` node with a `name` parameter.
+
+    Building the trie takes a single pass over the parameters,
+    routing to a destination then only looks at that destination's
+    parameters, unlike `route_params` which looks at all of them.
+
+    Parameters
+    ----------
+    params : Dict[str, Any], default None
+        Parameters to group.
+    """
+
+    __slots__ = ("params", "children")
+
+    def __init__(self, params: Dict[str, Any] = None):
+        # non routed parameters at this level
+        self.params = dict()
+        self.children = dict()
+        for key, val in (params or dict()).items():
+            node = self
+            prefix, sep, rest = key.partition("__")
+            while sep:
+                node = node.children.setdefault(prefix, RoutingTrie())
+                prefix, sep, rest = rest.partition("__")
+            node.params[prefix] = val
+
+    def route(self, destination: str, strict: bool = False) -> "RoutingTrie":
+        """Equivalent of `route_params(params, destination, pass_filter=set())`.
+
+        Parameters
+        ----------
+        destination : str
+            Destination to route to, ex: `optimizer` or `0`.
+        strict : bool, default False
+            If True, drop parameters routed further down.
+
+        Returns
+        -------
+        RoutingTrie
+            The routed parameters, which must not be modified.
+        """
+        node = self
+        for segment in destination.split("__"):
+            node = node.children.get(segment, _EMPTY_TRIE)
+        if strict and node.children:
+            strict_node = RoutingTrie()
+            strict_node.params = node.params
+            return strict_node
+        return node
+
+
+_EMPTY_TRIE = RoutingTrie()
+
+
 def unflatten_params(items, params, base_params=None):
     """Recursively compile nested structures of classes
     using parameters from params.
+
+    `params` can be a dictionary or a `RoutingTrie`.
     """
+    if not isinstance(params, RoutingTrie):
+        params = RoutingTrie(params)
     if isclass(items):
         item = items
-        new_base_params = {p: v for p, v in params.items() if "__" not in p}
         base_params = base_params or dict()
-        kwargs = {**base_params, **new_base_params}
+        kwargs = {**base_params, **params.params}
         for p, v in kwargs.items():
-            kwargs[p] = unflatten_params(
-                items=v,
-                params=route_params(
-                    params=params, destination=f"{p}", pass_filter=set(), strict=False,
-                ),
-            )
+            kwargs[p] = unflatten_params(items=v, params=params.route(f"{p}"))
         return item(**kwargs)
     if isinstance(items, (list, tuple)):
         iter_type_ = type(items)
         res = list()
-        new_base_params = {p: v for p, v in params.items() if "__" not in p}
         for idx, item in enumerate(items):
-            item_params = route_params(
-                params=params, destination=f"{idx}", pass_filter=set(), strict=False,
-            )
             res.append(
                 unflatten_params(
-                    items=item, params=item_params, base_params=new_base_params
+                    items=item,
+                    params=params.route(f"{idx}"),
+                    base_params=params.params,
                 )
             )
         return iter_type_(res)
     if isinstance(items, (dict,)):
         res = dict()
-        new_base_params = {p: v for p, v in params.items() if "__" not in p}
         for key, item in items.items():
-            item_params = route_params(
-                params=params, destination=f"{key}", pass_filter=set(), strict=False,
-            )
             res[key] = unflatten_params(
-                items=item, params=item_params, base_params=new_base_params,
+                items=item, params=params.route(f"{key}"), base_params=params.params,
             )
         return res
     # non-compilable item, check if it has any routed parameters
     item = items
-    new_base_params = {p: v for p, v in params.items() if "__" not in p}
     base_params = base_params or dict()
-    kwargs = {**base_params, **new_base_params}
+    kwargs = {**base_params, **params.params}
     if kwargs:
         raise TypeError(
             f'TypeError: "{str(item)}" object of type "{type(item)}"'
@@ -0,0 +1,237 @@
+"""Micro-batching of concurrent predictions."""
+
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+
+import numpy as np
+import scipy.sparse as sp
+
+from sklearn.exceptions import NotFittedError
+from sklearn.utils.validation import _num_samples
+
+from ._utils import _flatten_inputs, _map_inputs
+
+
+# tells the background thread to stop
+_STOP = object()
+
+
+class MicroBatcher:
+    """Coalesces concurrent prediction requests on a fitted estimator
+    into batched calls of its Keras model.
+
+    A background thread takes pending requests, validates their inputs,
+    concatenates them into a batch of at most `max_batch_size` samples,
+    runs the Keras model once through the traced prediction function
+    (see `BaseWrapper.compile_predict`) and scatters the outputs back to
+    the requests, which get exactly what calling `method` on their own
+    inputs would return.
+
+    This raises throughput when many threads or coroutines (ex: those of
+    a web server) predict a few samples at a time, since the cost of a
+    model call barely depends on the number of samples in small batches.
+
+    >>> batcher = MicroBatcher(clf, method="predict_proba")  # doctest: +SKIP
+    >>> batcher(X_request)  # from any thread  # doctest: +SKIP
+
+    Invalid requests fail on their own. Requests of `max_batch_size`
+    samples or more are run on their own.
+
+    The background thread is started by the first request and stops
+    after `idle_timeout_s` seconds without requests, or when `close` is
+    called (ex: by using the batcher as a context manager).
+
+    Arguments:
+        estimator : BaseWrapper
+            Fitted estimator. It may be refit or used directly while
+            the batcher is in use.
+        method : {"predict", "predict_proba"}, default "predict"
+            Method of `estimator` to batch.
+        max_batch_size : int, default None
+            Maximum number of samples per model call. Defaults to the
+            estimator's `batch_size` for `predict`, or 32, which are the
+            largest batches run through the traced prediction function.
+        max_delay_s : float, default 0.002
+            Maximum time the first request of a batch waits for others,
+            in seconds.
+        idle_timeout_s : float, default 10.0
+            Time after which the background thread stops if there are no
+            requests, in seconds.
+    """
+
+    def __init__(
+        self,
+        estimator,
+        method="predict",
+        max_batch_size=None,
+        max_delay_s=0.002,
+        idle_timeout_s=10.0,
+    ):
+        if not hasattr(estimator, "_decode_" + method):
+            raise ValueError(
+                "`method` must be one of the prediction methods of {},"
+                " got {}".format(type(estimator).__name__, method)
+            )
+        self.estimator = estimator
+        self.method = method
+        self.max_batch_size = max_batch_size
+        self.max_delay_s = max_delay_s
+        self.idle_timeout_s = idle_timeout_s
+        self._requests = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def submit(self, X) -> Future:
+        """Schedules `estimator.<method>(X)` along with concurrent requests.
+
+        Arguments:
+            X : array-like, shape `(n_samples, n_features)`
+                Test samples.
+
+        Returns:
+            future : concurrent.futures.Future
+                Future of the result. Cancelling it before its batch is
+                run skips it. In coroutines, use `asyncio.wrap_future`
+                to await it.
+        """
+        if not self.estimator.is_fitted_:
+            raise NotFittedError(
+                "Estimator needs to be fit before `predict` " "can be called"
+            )
+        future = Future()
+        request = (X, _num_samples(_flatten_inputs(X)[0]), future)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Cannot predict with a closed `MicroBatcher`.")
+            self._requests.put(request)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._serve, daemon=True)
+                self._thread.start()
+        return future
+
+    def __call__(self, X):
+        """Returns `estimator.<method>(X)`, computed along with
+        concurrent requests.
+        """
+        return self.submit(X).result()
+
+    def close(self):
+        """Serves pending requests and stops the background thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._requests.put(_STOP)
+        if thread is not None:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_max_batch_size(self):
+        if self.max_batch_size is not None:
+            return self.max_batch_size
+        estimator = self.estimator
+        pred_args = estimator._get_routed_params(
+            destination="predict", pass_filter=estimator._predict_kwargs
+        )
+        # Model.predict defaults to batches of 32 samples
+        return pred_args.get("batch_size") or 32
+
+    def _serve(self):
+        """Runs batches of requests until idle or stopped."""
+        request = None
+        while True:
+            if request is None:
+                try:
+                    request = self._requests.get(timeout=self.idle_timeout_s)
+                except queue.Empty:
+                    with self._lock:
+                        if self._requests.empty():
+                            # restarted by the next request
+                            self._thread = None
+                            return
+                    continue
+            if request is _STOP:
+                return
+            batch, request = self._collect(request)
+            self._run(batch)
+
+    def _collect(self, request):
+        """Returns a batch of requests starting with `request`,
+        and the next request if it did not fit in the batch.
+        """
+        batch = [request]
+        n_samples = request[1]
+        max_batch_size = self._get_max_batch_size()
+        deadline = time.perf_counter() + self.max_delay_s
+        while n_samples < max_batch_size:
+            try:
+                request = self._requests.get(
+                    timeout=max(deadline - time.perf_counter(), 0)
+                )
+            except queue.Empty:
+                break
+            if request is _STOP or n_samples + request[1] > max_batch_size:
+                # it goes first in the next batch
+                return batch, request
+            batch.append(request)
+            n_samples += request[1]
+        return batch, None
+
+    def _run(self, batch):
+        """Predicts a batch of requests with a single model call."""
+        estimator = self.estimator
+        requests = []
+        for X, n_samples, future in batch:
+            if not future.set_running_or_notify_cancel():
+                # cancelled
+                continue
+            try:
+                X = estimator._validate_data(X=X, y=None, reset=False)
+            except Exception as error:
+                future.set_exception(error)
+                continue
+            requests.append((X, n_samples, future))
+        if not requests:
+            return
+        try:
+            if len(requests) == 1:
+                X = requests[0][0]
+            else:
+                # each input of multi-input models is stacked separately
+                X = _map_inputs(_stack, *(X for X, _, _ in requests))
+            outputs = estimator._predict_raw(X, fast=True)
+        except Exception as error:
+            for _, _, future in requests:
+                future.set_exception(error)
+            return
+        decode = getattr(estimator, "_decode_" + self.method)
+        start = 0
+        for _, n_samples, future in requests:
+            stop = start + n_samples
+            if isinstance(outputs, list):
+                request_outputs = [output[start:stop] for output in outputs]
+            else:
+                request_outputs = outputs[start:stop]
+            try:
+                future.set_result(decode(request_outputs))
+            except Exception as error:
+                future.set_exception(error)
+            start = stop
+
+
+def _stack(*arrs):
+    """Stacks the samples of validated arrays or sparse matrices."""
+    if any(sp.issparse(arr) for arr in arrs):
+        return sp.vstack(arrs, format="csr")
+    return np.concatenate(arrs)
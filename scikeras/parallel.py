@@ -0,0 +1,65 @@
+"""Joblib backend for parallelizing Keras estimators."""
+
+from joblib import cpu_count, register_parallel_backend
+from joblib._parallel_backends import LokyBackend
+
+
+def _initialize_worker(intra_op_threads, inter_op_threads):
+    """Runs once in each worker, before any task.
+
+    Imports TensorFlow, which then stays initialized for all tasks run
+    by the worker, and sizes its thread pools before they are created.
+    """
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+class KerasLokyBackend(LokyBackend):
+    """Loky backend with persistent TensorFlow workers.
+
+    Workers import TensorFlow once, when they start, and are reused
+    across calls (ex: successive hyperparameter searches) until they are
+    idle for `idle_worker_timeout` seconds.
+
+    To avoid oversubscribing the CPU, each worker's TensorFlow intra-op
+    thread pool is limited to `inner_max_num_threads` threads,
+    by default `cpu_count() // n_jobs`, like OpenMP and BLAS thread pools.
+
+    Tasks are sent to workers the same way as with the default backend,
+    large arrays are memory-mapped.
+
+    The backend is registered as `"scikeras"` when this module is imported:
+
+    >>> from joblib import parallel_backend
+    >>> import scikeras.parallel
+    >>> with parallel_backend("scikeras", n_jobs=4):  # doctest: +SKIP
+    ...     GridSearchCV(KerasClassifier(...), params).fit(X, y)
+
+    Arguments:
+        inter_op_threads : int, default 1
+            Size of each worker's TensorFlow inter-op thread pool.
+        idle_worker_timeout : int, default 600
+            Seconds after which idle workers are shut down.
+        **kwargs
+            Passed to `joblib`'s `LokyBackend`, ex: `inner_max_num_threads`.
+    """
+
+    def __init__(self, inter_op_threads=1, idle_worker_timeout=600, **kwargs):
+        super().__init__(**kwargs)
+        self.inter_op_threads = inter_op_threads
+        self.idle_worker_timeout = idle_worker_timeout
+
+    def configure(self, n_jobs=1, parallel=None, **kwargs):
+        # workers are only reused if these do not change
+        kwargs.setdefault("idle_worker_timeout", self.idle_worker_timeout)
+        intra_op_threads = self.inner_max_num_threads or max(
+            cpu_count() // self.effective_n_jobs(n_jobs), 1
+        )
+        kwargs.setdefault("initializer", _initialize_worker)
+        kwargs.setdefault("initargs", (intra_op_threads, self.inter_op_threads))
+        return super().configure(n_jobs=n_jobs, parallel=parallel, **kwargs)
+
+
+register_parallel_backend("scikeras", KerasLokyBackend)
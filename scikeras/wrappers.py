@@ -1,14 +1,18 @@
 """Wrapper for using the Scikit-Learn API with Keras models.
 """
+import asyncio
 import inspect
 import os
+import pickle
+import threading
 import warnings
+import weakref
 
 from collections import defaultdict
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
 import numpy as np
-import tensorflow as tf
+import scipy.sparse as sp
 
 from sklearn.base import BaseEstimator
 from sklearn.exceptions import NotFittedError
@@ -16,27 +20,90 @@ from sklearn.metrics import accuracy_score as sklearn_accuracy_score
 from sklearn.metrics import r2_score as sklearn_r2_score
 from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import LabelEncoder, OneHotEncoder
+from sklearn.utils import gen_batches
 from sklearn.utils.multiclass import type_of_target
-from sklearn.utils.validation import _check_sample_weight, check_array, check_X_y
-from tensorflow.keras import losses as losses_module
-from tensorflow.keras import metrics as metrics_module
-from tensorflow.keras import optimizers as optimizers_module
-from tensorflow.keras.models import Model
-from tensorflow.python.keras.losses import is_categorical_crossentropy
-from tensorflow.python.keras.utils.generic_utils import register_keras_serializable
+from sklearn.utils.validation import (
+    _check_sample_weight,
+    _num_samples,
+    check_array,
+    check_consistent_length,
+    check_X_y,
+)
 
+from ._lazy import LazyModule, is_keras_model, register_keras_serializable, tf
 from ._utils import (
+    NOT_TIMED,
     LabelDimensionTransformer,
+    ModelCache,
+    OneHotTargets,
+    PhaseTimer,
+    RoutingTrie,
     TFRandomState,
     _class_from_strings,
+    _dataset_from_batches,
+    _flatten_inputs,
+    _frame_columns,
+    _is_multi_input,
+    _iter_chunks,
+    _map_inputs,
+    _read_frame,
     _windows_upcast_ints,
-    accepts_kwargs,
+    get_build_fn_signature,
     get_metric_full_name,
-    has_param,
     make_model_picklable,
+    reset_optimizer,
     route_params,
     unflatten_params,
 )
+from .batching import MicroBatcher
+
+
+losses_module = LazyModule("tensorflow.keras.losses")
+metrics_module = LazyModule("tensorflow.keras.metrics")
+optimizers_module = LazyModule("tensorflow.keras.optimizers")
+keras_losses = LazyModule("tensorflow.python.keras.losses")
+
+
+# compiled models not in use, shared by all wrappers with `model_cache=True`
+_model_cache = ModelCache(maxsize=16)
+
+
+def set_model_cache_size(maxsize):
+    """Sets the maximum number of models cached by estimators
+    with `model_cache=True`, 16 by default.
+
+    Each cached model holds a copy of the weights it was built with.
+    The least recently cached models are dropped to fit the new size.
+
+    Arguments:
+        maxsize : int
+            Maximum number of cached models, 0 disables caching.
+    """
+    _model_cache.resize(maxsize)
+
+
+def clear_model_cache():
+    """Drops all models cached by estimators with `model_cache=True`.
+
+    Models still in use by an estimator are cached again once it
+    builds a new model or is garbage collected.
+    """
+    _model_cache.clear()
+
+
+# serializes the tracing of prediction functions by `compile_predict`
+_compile_predict_lock = threading.Lock()
+
+# serializes fills of the routing caches of all estimators,
+# which happen on the inference path too
+_routing_cache_lock = threading.RLock()
+
+# lookup tables decoding the predictions of each fitted KerasClassifier,
+# kept out of the estimators so that `predict` does not modify them
+_decode_tables = weakref.WeakKeyDictionary()
+
+# serializes the loading of models saved with `BaseWrapper.save`
+_load_model_lock = threading.Lock()
 
 
 class BaseWrapper(BaseEstimator):
@@ -55,6 +122,53 @@ class BaseWrapper(BaseEstimator):
             reproducible deterministic state using this seed.
             Pass an int for reproducible results across multiple
             function calls.
+        model_cache : bool, default=False
+            Reuse compiled models across fits (including fits of clones,
+            ex: in hyperparameter searches) when the routed `model__`
+            parameters, meta parameters, compile parameters and
+            `random_state` match those of a model no longer in use.
+            Reused models are reset to the weights they were built with
+            and get a new optimizer. Models are only cached when
+            `random_state` is set, otherwise each fit starts from new
+            random weights. See `set_model_cache_size` and
+            `clear_model_cache`.
+        distribution : tf.distribute.Strategy or callable, default=None
+            Strategy to train the model with, ex:
+            `tf.distribute.MirroredStrategy` or
+            `tf.distribute.experimental.MultiWorkerMirroredStrategy`,
+            or a callable returning one, which is called each time
+            the model is built. Prefer callables: unlike strategies,
+            they can be cloned by scikit-learn's model selection tools.
+            The model is built and compiled within the strategy's scope
+            and Keras shards input batches across its replicas, so
+            `batch_size` is the global batch size.
+            Models trained with a strategy are not cached.
+        max_time_s : float, default=None
+            Wall-clock budget of each call to `fit` or `partial_fit`,
+            in seconds. Training stops after the batch that exhausts it,
+            even mid-epoch.
+        max_samples : int, default=None
+            Number of samples each call to `fit` or `partial_fit` trains
+            on, counting samples once per epoch they are seen in and
+            `batch_size` samples per batch. Training stops once it is
+            reached, even mid-epoch, or after `epochs` epochs.
+            Along with `warm_start` or `partial_fit`, which continue training
+            the same model, budgets make the wrappers fit for successive
+            halving, ex: `HalvingGridSearchCV(..., resource="max_samples")`.
+        profile : bool or callable, default=False
+            If True, the time spent in each phase of `fit` and `predict`
+            (`validate_data`, `preprocess_X`, `preprocess_y`, `build_model`,
+            `compile`, `model_fit`, `model_predict` and `postprocess_y`)
+            is added up in the `timings_` dict, in seconds, which is reset
+            when a new model is fit and is not pickled. `compile` is only
+            timed for models that are not compiled by the build function.
+            A callable is also called as `profile(phase, seconds)`
+            each time a phase ends.
+        max_batch_delay_s : float, default=0.002
+            Maximum time, in seconds, that calls of the `apredict` and
+            `apredict_proba` coroutines wait for concurrent calls to
+            share a model call with, see `scikeras.batching.MicroBatcher`.
+            Model calls run up to `batch_size` samples for `predict`.
         For all other parameters see tf.keras.Model documentation.
     """
 
@@ -104,6 +218,12 @@ class BaseWrapper(BaseEstimator):
         # parameters consumed by the wrappers themselves
         "warm_start",
         "random_state",
+        "model_cache",
+        "distribution",
+        "max_time_s",
+        "max_samples",
+        "profile",
+        "max_batch_delay_s",
     }
 
     _meta = {
@@ -122,6 +242,17 @@ class BaseWrapper(BaseEstimator):
         "_user_params",
     }
 
+    _transient_attrs = {
+        # caches and handles created on demand by `fit`, `predict`, etc.
+        # these are never pickled and are not meta parameters
+        "_predict_function",
+        "_routing_cache",
+        "_model_lease",
+        "timings_",
+        "_batchers",
+        "_saved_model_path",
+    }
+
     _routing_prefixes = {
         "model",
         "fit",
@@ -139,6 +270,12 @@ class BaseWrapper(BaseEstimator):
         build_fn=None,  # for backwards compatibility
         warm_start=False,
         random_state=None,
+        model_cache=False,
+        distribution=None,
+        max_time_s=None,
+        max_samples=None,
+        profile=False,
+        max_batch_delay_s=0.002,
         optimizer="rmsprop",
         loss=None,
         metrics=None,
@@ -153,9 +290,9 @@ class BaseWrapper(BaseEstimator):
     ):
 
         # ensure prebuilt model can be serialized
-        if isinstance(model, Model):
+        if is_keras_model(model):
             make_model_picklable(model)
-        if isinstance(build_fn, Model):
+        if is_keras_model(build_fn):
             make_model_picklable(build_fn)
 
         # Parse hardcoded params
@@ -163,6 +300,12 @@ class BaseWrapper(BaseEstimator):
         self.build_fn = build_fn
         self.warm_start = warm_start
         self.random_state = random_state
+        self.model_cache = model_cache
+        self.distribution = distribution
+        self.max_time_s = max_time_s
+        self.max_samples = max_samples
+        self.profile = profile
+        self.max_batch_delay_s = max_batch_delay_s
         self.optimizer = optimizer
         self.loss = loss
         self.metrics = metrics
@@ -181,6 +324,12 @@ class BaseWrapper(BaseEstimator):
         if kwargs:
             self._user_params = set(kwargs)
 
+    def __setattr__(self, name, value):
+        if not (name.startswith("_") or name.endswith("_")):
+            # a parameter changed, routed parameters need to be re-computed
+            self.__dict__.pop("_routing_cache", None)
+        super().__setattr__(name, value)
+
     @property
     def __name__(self):
         return self.__class__.__name__
@@ -189,11 +338,56 @@ class BaseWrapper(BaseEstimator):
     def _model_params(self):
         return {
             k[len("model__") :]
-            for k in self.get_params()
+            for k in self._get_params_cached()
             if "model__" == k[: len("model__")]
             or k in getattr(self, "_user_params", set())
         }
 
+    def _get_params_cached(self) -> Dict[str, Any]:
+        """Returns the result of `get_params`, cached until a parameter is set.
+
+        The returned dictionary is shared, it must not be modified.
+        """
+        return self._cached("params", self.get_params)
+
+    def _cached(self, key, compute: Callable):
+        """Returns `compute()`, cached under `key` until a parameter is set.
+
+        Cache fills are serialized, so that threads predicting concurrently
+        with the same estimator can share its cache.
+        """
+        cache = self.__dict__.setdefault("_routing_cache", dict())
+        if key not in cache:
+            with _routing_cache_lock:
+                if key not in cache:
+                    cache[key] = compute()
+        return cache[key]
+
+    def _get_routed_params(
+        self, destination: str, pass_filter, strict: bool = False
+    ) -> Dict[str, Any]:
+        """Cached equivalent of `route_params(self.get_params(), ...)`.
+
+        The cache is cleared whenever a parameter is set, see `__setattr__`.
+
+        Returns
+        -------
+        Dict[str, Any]
+            A copy of the routed parameters that callers are free to modify.
+        """
+        if pass_filter is not None:
+            pass_filter = frozenset(pass_filter)
+        routed = self._cached(
+            (destination, pass_filter, strict),
+            lambda: route_params(
+                self._get_params_cached(),
+                destination=destination,
+                pass_filter=pass_filter,
+                strict=strict,
+            ),
+        )
+        return dict(routed)
+
     def _check_model_param(self):
         """Checks `model` and returns model building
         function to use.
@@ -217,7 +411,7 @@ class BaseWrapper(BaseEstimator):
                     "you must implement `_keras_build_fn`"
                 )
             final_build_fn = self._keras_build_fn
-        elif isinstance(model, Model):
+        elif is_keras_model(model):
             # pre-built Keras Model
             def final_build_fn():
                 return model
@@ -248,36 +442,29 @@ class BaseWrapper(BaseEstimator):
         dict
             Dictionary of kwargs for `Model.compile`.
         """
-        init_params = self.get_params()
-        compile_kwargs = route_params(
-            init_params, destination="compile", pass_filter=self._compile_kwargs,
+        compile_kwargs = self._get_routed_params(
+            destination="compile", pass_filter=self._compile_kwargs,
         )
+        # params routed to optimizers, losses and metrics grouped by prefix
+        routing = self._cached("trie", lambda: RoutingTrie(self._get_params_cached()))
         compile_kwargs["optimizer"] = _class_from_strings(
             compile_kwargs["optimizer"], optimizers_module.get
         )
         compile_kwargs["optimizer"] = unflatten_params(
             items=compile_kwargs["optimizer"],
-            params=route_params(
-                init_params, destination="optimizer", pass_filter=set(), strict=True,
-            ),
+            params=routing.route("optimizer", strict=True),
         )
         compile_kwargs["loss"] = _class_from_strings(
             compile_kwargs["loss"], losses_module.get
         )
         compile_kwargs["loss"] = unflatten_params(
-            items=compile_kwargs["loss"],
-            params=route_params(
-                init_params, destination="loss", pass_filter=set(), strict=False,
-            ),
+            items=compile_kwargs["loss"], params=routing.route("loss"),
         )
         compile_kwargs["metrics"] = _class_from_strings(
             compile_kwargs["metrics"], metrics_module.get
         )
         compile_kwargs["metrics"] = unflatten_params(
-            items=compile_kwargs["metrics"],
-            params=route_params(
-                init_params, destination="metrics", pass_filter=set(), strict=False,
-            ),
+            items=compile_kwargs["metrics"], params=routing.route("metrics"),
         )
         return compile_kwargs
 
@@ -297,44 +484,57 @@ class BaseWrapper(BaseEstimator):
         final_build_fn = self._check_model_param()
 
         # collect parameters
-        params = self.get_params()
-        build_params = route_params(
-            params,
-            destination="model",
-            pass_filter=getattr(self, "_user_params", set()),
+        build_params = self._get_routed_params(
+            destination="model", pass_filter=getattr(self, "_user_params", set()),
         )
         compile_kwargs = None
-        if has_param(final_build_fn, "meta") or accepts_kwargs(final_build_fn):
+        signature = get_build_fn_signature(final_build_fn)
+        if signature.meta:
             # build_fn accepts `meta`, add it
             meta = route_params(
                 self.get_meta(), destination=None, pass_filter=self._meta,
             )
             build_params["meta"] = meta
-        if has_param(final_build_fn, "compile_kwargs") or accepts_kwargs(
-            final_build_fn
-        ):
+        if signature.compile_kwargs:
             # build_fn accepts `compile_kwargs`, add it
             compile_kwargs = self._get_compile_kwargs()
             build_params["compile_kwargs"] = compile_kwargs
-        if has_param(final_build_fn, "params") or accepts_kwargs(final_build_fn):
+        if signature.params:
             # build_fn accepts `params`, i.e. all of get_params()
-            build_params["params"] = self.get_params()
+            build_params["params"] = dict(self._get_params_cached())
 
-        # build model
-        if self._random_state is not None:
-            with TFRandomState(self._random_state):
-                model = final_build_fn(**build_params)
-        else:
-            model = final_build_fn(**build_params)
+        strategy = self._get_distribution_strategy()
 
-        # make serializable
-        make_model_picklable(model)
+        cache_key = None
+        if self.model_cache and strategy is None:
+            cache_key = self._model_cache_key(final_build_fn, build_params)
+            model = self._reuse_cached_model(cache_key)
+            if model is not None:
+                return model
 
-        # compile model if user gave us an un-compiled model
-        if not (hasattr(model, "loss") and hasattr(model, "optimizer")):
-            if compile_kwargs is None:
-                compile_kwargs = self._get_compile_kwargs()
-            model.compile(**compile_kwargs)
+        if strategy is None:
+            # the enclosing strategy, if any
+            strategy = tf.distribute.get_strategy()
+
+        # variables are created by the build function and `compile`
+        with strategy.scope():
+            # build model
+            with self._timed("build_model"):
+                if self._random_state is not None:
+                    with TFRandomState(self._random_state):
+                        model = final_build_fn(**build_params)
+                else:
+                    model = final_build_fn(**build_params)
+
+            # make serializable
+            make_model_picklable(model)
+
+            # compile model if user gave us an un-compiled model
+            if not (hasattr(model, "loss") and hasattr(model, "optimizer")):
+                if compile_kwargs is None:
+                    compile_kwargs = self._get_compile_kwargs()
+                with self._timed("compile"):
+                    model.compile(**compile_kwargs)
 
         if not getattr(model, "loss", None) or (
             isinstance(model.loss, list)
@@ -351,8 +551,116 @@ class BaseWrapper(BaseEstimator):
                 " for more information on Keras losses."
             )
 
+        if cache_key is not None:
+            self._lease_model(
+                cache_key, (model, model.get_weights(), model.optimizer.get_config())
+            )
+        else:
+            # the new model replaces the current one
+            self._release_model()
+
         return model
 
+    def _get_distribution_strategy(self):
+        """Returns the strategy given by `distribution`, or None."""
+        strategy = self.distribution
+        if strategy is not None and not isinstance(strategy, tf.distribute.Strategy):
+            if callable(strategy):
+                strategy = strategy()
+            if not isinstance(strategy, tf.distribute.Strategy):
+                raise TypeError(
+                    "`distribution` must be a `tf.distribute.Strategy` or a"
+                    " callable returning one, got {}".format(self.distribution)
+                )
+        return strategy
+
+    def _model_cache_key(self, build_fn, build_params):
+        """Returns the key of the architecture built by `build_fn`
+        with `build_params` in the model cache, or None if it can't be cached.
+        """
+        if is_keras_model(self.model) or is_keras_model(self.build_fn):
+            # pre-built models are not rebuilt anyways
+            return None
+        if self._random_state is None:
+            # each model must start from new random weights
+            return None
+        meta = route_params(self.get_meta(), destination=None, pass_filter=self._meta)
+        for attr in ("model_", "history_", "is_fitted_"):
+            # left over from previous fits
+            meta.pop(attr, None)
+        for attr in ("X_shape_", "y_shape_"):
+            # the number of samples does not change the architecture
+            shape = meta.get(attr)
+            if isinstance(shape, dict):
+                # multi-input models
+                meta[attr] = {key: shape_[1:] for key, shape_ in shape.items()}
+            elif shape is not None:
+                meta[attr] = shape[1:]
+        compile_params = [
+            self._get_routed_params("compile", pass_filter=self._compile_kwargs),
+            *(
+                self._get_routed_params(destination, pass_filter=set())
+                for destination in ("optimizer", "loss", "metrics")
+            ),
+        ]
+        model_params = {
+            k: v
+            for k, v in build_params.items()
+            if k not in ("meta", "compile_kwargs", "params")
+        }
+        try:
+            return pickle.dumps(
+                (
+                    type(self),
+                    getattr(build_fn, "__func__", build_fn),
+                    model_params,
+                    meta,
+                    compile_params,
+                )
+            )
+        except (pickle.PicklingError, AttributeError, TypeError):
+            # ex: lambdas or locally defined functions
+            return None
+
+    def _reuse_cached_model(self, key):
+        """Takes a model from the model cache and resets it to the
+        state it was built in, if available.
+        """
+        lease = self.__dict__.get("_model_lease")
+        info = lease.peek() if lease is not None else None
+        if info is not None and info[2][0] == key:
+            # the current model has the same architecture, keep it
+            entry = info[2][1]
+        else:
+            entry = _model_cache.pop(key)
+        if entry is None:
+            return None
+        model, weights, optimizer_config = entry
+        # the same weights as a new model built with the same `random_state`
+        model.set_weights(weights)
+        reset_optimizer(model, optimizer_config)
+        self._lease_model(key, entry)
+        return model
+
+    def _lease_model(self, key, entry):
+        """Marks the model in `entry` as used by this estimator.
+
+        It is returned to the model cache when this estimator
+        builds a new model or is garbage collected. The model leased
+        before, if any, is returned to the model cache now.
+        """
+        lease = self.__dict__.pop("_model_lease", None)
+        old = lease.detach() if lease is not None else None
+        if old is not None and old[2][1] is not entry:
+            _model_cache.push(*old[2])
+        self._model_lease = weakref.finalize(self, _model_cache.push, key, entry)
+
+    def _release_model(self):
+        """Returns the model used by this estimator to the model cache."""
+        lease = self.__dict__.pop("_model_lease", None)
+        if lease is not None:
+            lease()
+
     def _fit_keras_model(self, X, y, sample_weight, warm_start):
         """Fits the Keras model.
 
@@ -360,11 +668,12 @@ class BaseWrapper(BaseEstimator):
         model's `fit` method with appropriate arguments.
 
         Arguments:
-            X : array-like, shape `(n_samples, n_features)`
+            X : array-like, shape `(n_samples, n_features)` or tf.data.Dataset
                 Training samples where `n_samples` is the number of samples
                 and `n_features` is the number of features.
+                A dataset must yield batches of `(X, y)`.
             y : array-like, shape `(n_samples,)` or `(n_samples, n_outputs)`
-                True labels for `X`.
+                True labels for `X`. None if `X` is a dataset.
             sample_weight : array-like of shape (n_samples,)
                 Sample weights. The Keras Model must support this.
             warm_start : bool
@@ -378,21 +687,35 @@ class BaseWrapper(BaseEstimator):
             ValueError : In case sample_weight != None and the Keras model's
                         `fit` method does not support that parameter.
         """
-        if os.name == "nt":
+        if os.name == "nt" and not isinstance(X, tf.data.Dataset):
             # see tensorflow/probability#886
             X = _windows_upcast_ints(X)
             y = _windows_upcast_ints(y)
 
         # collect parameters
-        params = self.get_params()
-        fit_args = route_params(params, destination="fit", pass_filter=self._fit_kwargs)
+        fit_args = self._get_routed_params(
+            destination="fit", pass_filter=self._fit_kwargs
+        )
         fit_args["sample_weight"] = sample_weight
-
-        if self._random_state is not None:
-            with TFRandomState(self._random_state):
-                hist = self.model_.fit(x=X, y=y, **fit_args)
+        if isinstance(X, tf.data.Dataset):
+            # batches come from the dataset
+            batch_size = fit_args.pop("batch_size", None)
         else:
-            hist = self.model_.fit(x=X, y=y, **fit_args)
+            batch_size = fit_args.get("batch_size")
+        if self.max_time_s is not None or self.max_samples is not None:
+            from ._callbacks import TrainingBudget
+
+            budget = TrainingBudget(max_time_s=self.max_time_s)
+            if self.max_samples is not None:
+                budget.max_steps = -(-self.max_samples // (batch_size or 32))
+            fit_args["callbacks"] = list(fit_args.get("callbacks") or []) + [budget]
+
+        with self._timed("model_fit"):
+            if self._random_state is not None:
+                with TFRandomState(self._random_state):
+                    hist = self.model_.fit(x=X, y=y, **fit_args)
+            else:
+                hist = self.model_.fit(x=X, y=y, **fit_args)
 
         if warm_start:
             if not hasattr(self, "history_"):
@@ -438,23 +761,37 @@ class BaseWrapper(BaseEstimator):
         ----------
         X : {array-like, sparse matrix, dataframe} of shape \
                 (n_samples, n_features)
-            The input samples.
+            The input samples, or a dict, list or tuple of those
+            for multi-input models.
         y : array-like of shape (n_samples,), default=None
             The targets. If None, `check_array` is called on `X` and
             `check_X_y` is called otherwise.
         reset : bool, default=True
-            Whether to reset the `n_features_in_` attribute.
+            Whether to reset the `n_features_in_` and `feature_names_in_`
+            attributes. For multi-input models, `n_features_in_` has the
+            same structure as `X`.
             If False, the input will be checked for consistency with data
             provided when reset was last True.
 
         Returns
         -------
         out : {ndarray, sparse matrix} or tuple of these
-            The validated input. A tuple is returned if `y` is not None.
+            The validated input, with the same structure as `X` for
+            multi-input models. A tuple is returned if `y` is not None.
         """
+        # data frames are read column by column into a single array
+        # of their common numeric dtype, or of TFs backend float type
+        feature_names = None
+        frame = _frame_columns(X)
+        if frame is not None:
+            names, columns = frame
+            X = _read_frame(X, columns, dtype=tf.keras.backend.floatx())
+            # like Scikit-Learn, only record string column names
+            if names and all(isinstance(name, str) for name in names):
+                feature_names = np.asarray(names, dtype=object)
 
         def _check_array_dtype(arr):
-            if not isinstance(arr, np.ndarray):
+            if not isinstance(arr, np.ndarray) and not sp.issparse(arr):
                 return _check_array_dtype(np.asarray(arr))
             elif arr.dtype.kind != "O":
                 return None  # check_array won't do any casting with dtype=None
@@ -463,29 +800,74 @@ class BaseWrapper(BaseEstimator):
                 # instead of float64 (sklearns default)
                 return tf.keras.backend.floatx()
 
-        if y is not None:
-            X, y = check_X_y(
-                X,
-                y,
-                allow_nd=True,  # allow X to have more than 2 dimensions
-                multi_output=True,  # allow y to be 2D
-                dtype=None,
-            )
-            y = check_array(
-                y, ensure_2d=False, allow_nd=False, dtype=_check_array_dtype(y)
+        def _check_input(arr):
+            # one of the inputs of a multi-input model
+            frame = _frame_columns(arr)
+            if frame is not None:
+                arr = _read_frame(arr, frame[1], dtype=tf.keras.backend.floatx())
+            return check_array(
+                arr,
+                accept_sparse="csr",
+                allow_nd=True,
+                ensure_2d=False,  # allow 1D inputs, ex: ids for an embedding
+                dtype=_check_array_dtype(arr),
             )
-        X = check_array(X, allow_nd=True, dtype=_check_array_dtype(X))
 
-        n_features = X.shape[1]
+        # numeric arrays, including np.memmap and read-only arrays,
+        # are validated in place and returned as views, never copied
+        # sparse matrices are kept sparse, in CSR format to slice batches
+        if _is_multi_input(X):
+            # each input is validated on its own and keeps its dtype
+            X = _map_inputs(_check_input, X)
+            if y is not None:
+                y = check_array(
+                    y, ensure_2d=False, allow_nd=False, dtype=_check_array_dtype(y)
+                )
+                check_consistent_length(*_flatten_inputs(X), y)
+            else:
+                check_consistent_length(*_flatten_inputs(X))
+            n_features = _map_inputs(lambda arr: arr.shape[1] if arr.ndim > 1 else 1, X)
+        else:
+            if y is not None:
+                X, y = check_X_y(
+                    X,
+                    y,
+                    accept_sparse="csr",
+                    allow_nd=True,  # allow X to have more than 2 dimensions
+                    multi_output=True,  # allow y to be 2D
+                    dtype=None,
+                )
+                y = check_array(
+                    y, ensure_2d=False, allow_nd=False, dtype=_check_array_dtype(y)
+                )
+            X = check_array(
+                X, accept_sparse="csr", allow_nd=True, dtype=_check_array_dtype(X)
+            )
+            n_features = X.shape[1]
 
         if reset:
             self.n_features_in_ = n_features
+            if feature_names is None:
+                self.__dict__.pop("feature_names_in_", None)
+            else:
+                self.feature_names_in_ = feature_names
         else:
             if n_features != self.n_features_in_:
                 raise ValueError(
                     f"X has {n_features} features, but this {self.__name__} "
                     f"is expecting {self.n_features_in_} features as input."
                 )
+            fitted_names = getattr(self, "feature_names_in_", None)
+            if (
+                feature_names is not None
+                and fitted_names is not None
+                and not np.array_equal(feature_names, fitted_names)
+            ):
+                raise ValueError(
+                    "The feature names should match those that were passed"
+                    f" during fit, got {list(feature_names)} but this"
+                    f" {self.__name__} was fit on {list(fitted_names)}."
+                )
         if y is None:
             return X
         return X, y
@@ -538,18 +920,19 @@ class BaseWrapper(BaseEstimator):
         """Handles manipulation of X before fitting.
 
         Subclass and override this method to process X, for example
-        accommodate a multi-input model.
+        accommodate a multi-input model that is fed a single array.
 
         Arguments:
-            X : 2D numpy array
+            X : 2D numpy array, or dict or list of arrays for multi-input
+                models
 
         Returns:
-            X : unchanged 2D numpy array
+            X : unchanged X
             extra_args : attributes of output `y`.
         """
         extra_args = {
-            "X_dtype_": X.dtype,
-            "X_shape_": X.shape,
+            "X_dtype_": _map_inputs(lambda arr: arr.dtype, X),
+            "X_shape_": _map_inputs(lambda arr: arr.shape, X),
         }
         return X, extra_args
 
@@ -560,6 +943,10 @@ class BaseWrapper(BaseEstimator):
             X : array-like, shape `(n_samples, n_features)`
                 Training samples where `n_samples` is the number of samples
                 and `n_features` is the number of features.
+                `np.memmap` arrays are read one batch at a time
+                instead of being loaded into memory.
+                Sparse matrices are fed to the model as `tf.SparseTensor`
+                batches, without being densified.
             y : array-like, shape `(n_samples,)` or `(n_samples, n_outputs)`
                 True labels for `X`.
             sample_weight : array-like of shape (n_samples,), default=None
@@ -582,6 +969,10 @@ class BaseWrapper(BaseEstimator):
             X : array-like, shape `(n_samples, n_features)`
                 Training samples where `n_samples` is the number of samples
                 and `n_features` is the number of features.
+                `np.memmap` arrays are read one batch at a time
+                instead of being loaded into memory.
+                Sparse matrices are fed to the model as `tf.SparseTensor`
+                batches, without being densified.
             y : array-like, shape `(n_samples,)` or `(n_samples, n_outputs)`
                 True labels for `X`.
             sample_weight : array-like of shape (n_samples,), default=None
@@ -595,7 +986,130 @@ class BaseWrapper(BaseEstimator):
         Raises:
             ValueError : In case of invalid shape for `y` argument.
         """
-        # Handle random state
+        self._init_random_state()
+        if not warm_start:
+            # timings of the previous model
+            self.__dict__.pop("timings_", None)
+
+        # memory-mapped arrays may not fit in memory, instead of converting
+        # them into tensors they are read one batch at a time
+        # sparse matrices are converted into sparse tensors one batch at a time
+        # Keras can only split validation data off of arrays
+        validation_split = self._get_routed_params("fit", self._fit_kwargs).get(
+            "validation_split"
+        )
+        inputs = _flatten_inputs(X)
+        if any(sp.issparse(arr) for arr in inputs) and validation_split:
+            raise ValueError(
+                "`validation_split` is not supported for sparse `X`,"
+                " Keras can only split validation data off of arrays."
+            )
+        batched = not validation_split and any(
+            isinstance(arr, np.memmap) or sp.issparse(arr) for arr in inputs
+        )
+
+        X, y = self._validate_fit_data(X, y, warm_start=warm_start)
+        rows = np.arange(_num_samples(y))
+
+        if sample_weight is not None:
+            sample_weight = _check_sample_weight(
+                sample_weight, y, dtype=np.dtype(tf.keras.backend.floatx())
+            )
+            # Scikit-Learn expects a 0 in sample_weight to mean
+            # "ignore the sample", but because of how Keras applies
+            # sample_weight to the loss function, this doesn't
+            # exactly work out (as in, sklearn estimator checks fail
+            # because the predictions differ by a small margin).
+            # To get around this, we manually delete these samples here
+            zeros = sample_weight == 0
+            if np.any(zeros):
+                if batched:
+                    # skip the rows when batching instead of copying X
+                    rows = rows[~zeros]
+                else:
+                    X = _map_inputs(lambda arr: arr[~zeros], X)
+                y = y[~zeros]
+                sample_weight = sample_weight[~zeros]
+                if sample_weight.size == 0:
+                    # could check any of the arrays here, arbitrary choice
+                    # there will be no samples left! warn users
+                    raise RuntimeError(
+                        "Cannot train because there are no samples"
+                        " left after deleting points with zero sample weight!"
+                    )
+
+        X, y = self._initialize(X, y, warm_start=warm_start)
+
+        lazy_targets = [
+            y_ for y_ in tf.nest.flatten(y) if isinstance(y_, OneHotTargets)
+        ]
+        if lazy_targets and not batched:
+            # feeding in-memory X batch by batch is slower and shuffles
+            # differently, it is opt-in (`lazy_one_hot=True`) and only saves
+            # memory if targets are larger than X
+            # it also prevents splitting validation data
+            X_nbytes = sum(
+                arr.data.nbytes if sp.issparse(arr) else arr.nbytes
+                for arr in tf.nest.flatten(X)
+            )
+            if (
+                getattr(self, "lazy_one_hot", None) is not True
+                or validation_split
+                or sum(y_.nbytes for y_ in lazy_targets) <= X_nbytes
+            ):
+                y = tf.nest.map_structure(
+                    lambda y_: y_.toarray() if isinstance(y_, OneHotTargets) else y_, y,
+                )
+            else:
+                batched = True
+                # samples with zero weights were already removed from X
+                rows = np.arange(len(lazy_targets[0]))
+
+        if batched:
+            X = self._gather_batches(X, y, sample_weight, rows)
+            y = sample_weight = None
+
+        # fit model
+        return self._fit_keras_model(
+            X, y, sample_weight=sample_weight, warm_start=warm_start
+        )
+
+    def _gather_batches(self, X, y, sample_weight, rows):
+        """Creates a dataset of `(X, y[, sample_weight])` batches
+        gathered on the fly, the i-th sample of `y` and `sample_weight`
+        being the `rows[i]`-th sample of `X`.
+
+        Unlike arrays passed to `Model.fit`, which are converted into
+        in-memory tensors, only one batch of `X` is read at a time.
+        """
+        fit_args = self._get_routed_params("fit", self._fit_kwargs)
+        batch_size = fit_args.get("batch_size") or 32
+        shuffle = fit_args.get("shuffle", True)
+
+        def take(idx):
+            X_batch = tf.nest.map_structure(lambda arr: arr[rows[idx]], X)
+            y_batch = tf.nest.map_structure(lambda arr: arr[idx], y)
+            if os.name == "nt":
+                # see tensorflow/probability#886
+                X_batch = _windows_upcast_ints(X_batch)
+                y_batch = _windows_upcast_ints(y_batch)
+            if sample_weight is None:
+                return X_batch, y_batch
+            return X_batch, y_batch, sample_weight[idx]
+
+        def batches():
+            # shuffling uses np.random, which is seeded by `random_state`
+            order = np.arange(rows.size)
+            if shuffle:
+                order = np.random.permutation(order)
+            for batch in gen_batches(rows.size, batch_size):
+                # sorted rows are read sequentially from disk
+                yield take(np.sort(order[batch]))
+
+        return _dataset_from_batches(batches, take(np.arange(1)))
+
+    def _init_random_state(self):
+        """Sets `_random_state` from the `random_state` parameter."""
         if isinstance(self.random_state, np.random.RandomState):
             # Keras needs an integer
             # we sample an integer and use that as a seed
@@ -608,7 +1122,10 @@ class BaseWrapper(BaseEstimator):
             # int or None
             self._random_state = self.random_state
 
-        # Data checks
+    def _validate_fit_data(self, X, y, warm_start):
+        """Validates training data, resetting `n_features_in_` unless
+        warm starting an already fitted estimator.
+        """
         if warm_start and not hasattr(self, "n_features_in_"):
             # Warm start requested but not fitted yet
             reset = True
@@ -618,40 +1135,29 @@ class BaseWrapper(BaseEstimator):
         else:
             # No warm start requested
             reset = True
-        X, y = self._validate_data(X=X, y=y, reset=reset)
+        with self._timed("validate_data"):
+            X, y = self._validate_data(X=X, y=y, reset=reset)
 
         # Save input dtype
         self.y_dtype_ = y.dtype
 
-        if sample_weight is not None:
-            sample_weight = _check_sample_weight(
-                sample_weight, X, dtype=np.dtype(tf.keras.backend.floatx())
-            )
-            # Scikit-Learn expects a 0 in sample_weight to mean
-            # "ignore the sample", but because of how Keras applies
-            # sample_weight to the loss function, this doesn't
-            # exactly work out (as in, sklearn estimator checks fail
-            # because the predictions differ by a small margin).
-            # To get around this, we manually delete these samples here
-            zeros = sample_weight == 0
-            if np.any(zeros):
-                X = X[~zeros]
-                y = y[~zeros]
-                sample_weight = sample_weight[~zeros]
-                if sample_weight.size == 0:
-                    # could check any of the arrays here, arbitrary choice
-                    # there will be no samples left! warn users
-                    raise RuntimeError(
-                        "Cannot train because there are no samples"
-                        " left after deleting points with zero sample weight!"
-                    )
+        return X, y
+
+    def _initialize(self, X, y, warm_start):
+        """Pre-processes validated `X` and `y`, setting meta parameters,
+        and builds the Keras model if needed.
 
+        Returns:
+            X, y : inputs and targets formatted for the Keras model.
+        """
         # pre process X, y
-        X, extra_args = self.preprocess_X(X)
+        with self._timed("preprocess_X"):
+            X, extra_args = self.preprocess_X(X)
         # update self.X_dtype_, self.X_shape_
         for attr_name, attr_val in extra_args.items():
             setattr(self, attr_name, attr_val)
-        y, extra_args = self.preprocess_y(y)
+        with self._timed("preprocess_y"):
+            y, extra_args = self.preprocess_y(y)
         # update self.classes_, self.n_outputs_, self.n_classes_ and
         #  self.target_type_
         for attr_name, attr_val in extra_args.items():
@@ -663,11 +1169,106 @@ class BaseWrapper(BaseEstimator):
 
         y = self._check_output_model_compatibility(y)
 
-        # fit model
+        return X, y
+
+    def fit_stream(self, data, sample=None):
+        """Constructs a new model with `build_fn` & fits it to a stream of
+        `(X, y)` batches, without materializing the whole dataset.
+
+        Meta parameters (`n_features_in_`, `classes_`, encoders, etc.)
+        are set from `sample`. Each batch is then validated and encoded
+        with them on the fly and fed to `Model.fit` through a
+        `tf.data.Dataset`.
+
+        Arguments:
+            data : tf.data.Dataset, iterable or callable
+                Stream of `(X, y)` batches.
+                Datasets and re-iterable objects (ex: a list of chunks)
+                are iterated over once per epoch.
+                Callables are called once per epoch and must return an
+                iterable of batches, for example a generator function.
+            sample : tuple of array-like `(X, y)`, default None
+                Data used to set meta parameters and build the model.
+                It must be representative of the whole stream,
+                for classifiers this means that it must contain all classes.
+                If None, the first batch of `data` is used.
+        Returns:
+            self : object
+                a reference to the instance that can be chain called
+                (ex: instance.fit_stream(data).predict(X) )
+        Raises:
+            TypeError : If `data` is a one-shot iterator.
+            ValueError : If `validation_split` is set,
+                Keras does not support it for datasets,
+                or if `max_samples` is set.
+        """
+        if not callable(data) and iter(data) is data:
+            raise TypeError(
+                "`data` can only be iterated over once, pass a callable"
+                " returning a new iterator (ex: a generator function) instead."
+            )
+        if self._get_routed_params("fit", self._fit_kwargs).get("validation_split"):
+            raise ValueError(
+                "`validation_split` is not supported by `fit_stream`,"
+                " hold out validation data from the stream instead."
+            )
+        if self.max_samples is not None:
+            raise ValueError(
+                "`max_samples` is not supported by `fit_stream`, the number"
+                " of samples in the stream is unknown. Use `max_time_s`"
+                " or limit the number of batches in the stream instead."
+            )
+
+        self._init_random_state()
+        if not self.warm_start:
+            # timings of the previous model
+            self.__dict__.pop("timings_", None)
+
+        if sample is None:
+            sample = next(iter(data() if callable(data) else data))
+        X, y = sample
+        X, y = self._validate_fit_data(X, np.asarray(y), warm_start=self.warm_start)
+        self._initialize(X, y, warm_start=self.warm_start)
+
+        def batches():
+            for X_batch, y_batch in data() if callable(data) else data:
+                yield self._encode_batch(X_batch, y_batch)
+
+        # the encoded sample fixes the structure and dtypes of the stream
+        dataset = _dataset_from_batches(batches, self._encode_batch(*sample))
+
         return self._fit_keras_model(
-            X, y, sample_weight=sample_weight, warm_start=warm_start
+            dataset, None, sample_weight=None, warm_start=self.warm_start
         )
 
+    def _encode_batch(self, X, y):
+        """Validates and encodes a single batch from `fit_stream`
+        using the meta parameters set from the stream sample.
+        """
+        X, y = self._validate_data(X=X, y=np.asarray(y), reset=False)
+        X, _ = self.preprocess_X(X)
+        y = self._encode_y(y)
+        if os.name == "nt":
+            # see tensorflow/probability#886
+            X = _windows_upcast_ints(X)
+            y = _windows_upcast_ints(y)
+        return X, y
+
+    def _encode_y(self, y):
+        """Transforms validated `y` into targets for the Keras model
+        with the state set by `preprocess_y` and
+        `_check_output_model_compatibility`, without re-fitting it.
+
+        By default, this is a no-op.
+
+        Arguments:
+            y : 1D or 2D numpy array
+
+        Returns:
+            y : numpy array or tuple of numpy arrays
+        """
+        return y
+
     def partial_fit(self, X, y, sample_weight=None):
         """
         Partially fit a model.
@@ -690,42 +1291,229 @@ class BaseWrapper(BaseEstimator):
         """
         return self._fit(X, y, sample_weight=sample_weight, warm_start=True)
 
-    def predict(self, X):
+    def predict(self, X, fast=False):
         """Returns predictions for the given test data.
 
         Arguments:
             X: array-like, shape `(n_samples, n_features)`
                 Test samples where `n_samples` is the number of samples
                 and `n_features` is the number of features.
+            fast : bool, default False
+                If True, batches of at most `batch_size` samples skip input
+                validation and `Model.predict` and are instead run through
+                the `tf.function` returned by `compile_predict`.
+                Larger batches and inputs that do not match the signature
+                of the data seen in `fit` use the regular path.
 
         Returns:
             preds: array-like, shape `(n_samples,)`
                 Predictions.
         """
+        # predict with Keras model
+        y_pred = self._predict_raw(X, fast=fast)
+
+        # post process y
+        return self._decode_predict(y_pred)
+
+    def _decode_predict(self, y_pred):
+        """Returns the predictions for raw outputs of the Keras model."""
+        with self._timed("postprocess_y"):
+            y, _ = self.postprocess_y(y_pred)
+        return y
+
+    async def apredict(self, X):
+        """Coroutine returning predictions for the given test data.
+
+        Instead of blocking the event loop, predictions are computed
+        by a background thread, which batches concurrent calls into
+        shared model calls (see `max_batch_delay_s`).
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+                Test samples where `n_samples` is the number of samples
+                and `n_features` is the number of features.
+
+        Returns:
+            preds: array-like, shape `(n_samples,)`
+                Predictions, same as those of `predict`.
+        """
+        return await asyncio.wrap_future(self._get_batcher("predict").submit(X))
+
+    def _get_batcher(self, method):
+        """Returns the batcher used by the `method` coroutine."""
+        batchers = self.__dict__.setdefault("_batchers", dict())
+        batcher = batchers.get(method)
+        if batcher is None:
+            batcher = batchers.setdefault(method, MicroBatcher(self, method=method))
+        batcher.max_delay_s = self.max_batch_delay_s
+        return batcher
+
+    def predict_iter(self, X, chunk_size=None):
+        """Yields predictions chunk by chunk, so that only one chunk of
+        inputs and predictions is held in memory at a time.
+
+        Arguments:
+            X : iterable of array-like or array-like
+                Iterable of chunks of test samples of shape
+                `(n_samples_chunk, n_features)`.
+                If `chunk_size` is given, a single array-like of shape
+                `(n_samples, n_features)` to be split into chunks.
+            chunk_size : int, default None
+                Number of samples per chunk when `X` is a single array-like.
+
+        Yields:
+            preds: array-like, shape `(n_samples_chunk,)`
+                Predictions for each chunk.
+        """
+        for X_chunk in _iter_chunks(X, chunk_size):
+            yield self.predict(X_chunk)
+
+    def _predict_raw(self, X, fast=False):
+        """Runs the Keras model on `X` and returns its raw outputs.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+                Test samples.
+            fast : bool, default False
+                Use the traced prediction function for small batches.
+
+        Returns:
+            y_pred: numpy array or list of numpy arrays
+                Outputs of the Keras model, before `postprocess_y`.
+
+        Like the rest of the inference path, this method can be called
+        concurrently from several threads. It only fills the routing cache
+        and, with `profile`, adds to `timings_`, both under locks.
+        """
         # check if fitted
         if not self.is_fitted_:
             raise NotFittedError(
                 "Estimator needs to be fit before `predict` " "can be called"
             )
 
+        # filter kwargs and get attributes for predict
+        pred_args = self._get_routed_params(
+            destination="predict", pass_filter=self._predict_kwargs
+        )
+
+        if fast and self._can_predict_fast(X, pred_args):
+            with self._timed("preprocess_X"):
+                X_fast, _ = self.preprocess_X(X)
+            # otherwise fall back to the regular path with the original X
+            if isinstance(X_fast, np.ndarray):
+                with self._timed("model_predict"):
+                    y_pred = self.compile_predict()(X_fast)
+                    if isinstance(y_pred, (list, tuple)):
+                        return [y_.numpy() for y_ in y_pred]
+                    return y_pred.numpy()
+
         # basic input checks
-        X = self._validate_data(X=X, y=None, reset=False)
+        with self._timed("validate_data"):
+            X = self._validate_data(X=X, y=None, reset=False)
 
         # pre process X
-        X, _ = self.preprocess_X(X)
+        with self._timed("preprocess_X"):
+            X, _ = self.preprocess_X(X)
+
+        # preprocess_X may return a dict, list or tuple of inputs
+        inputs = tf.nest.flatten(X)
+        if any(sp.issparse(arr) for arr in inputs):
+            # converted into sparse tensors one batch at a time
+            batch_size = pred_args.pop("batch_size", None) or 32
+            X_sparse = X
+
+            def batches():
+                for batch in gen_batches(_num_samples(inputs[0]), batch_size):
+                    # 1-tuples, lists of inputs are not mistaken for (X, y)
+                    yield (tf.nest.map_structure(lambda arr: arr[batch], X_sparse),)
+
+            X = _dataset_from_batches(
+                batches, (tf.nest.map_structure(lambda arr: arr[:1], X_sparse),)
+            )
 
-        # filter kwargs and get attributes for predict
-        params = self.get_params()
-        pred_args = route_params(
-            params, destination="predict", pass_filter=self._predict_kwargs
+        # predict with Keras model
+        with self._timed("model_predict"):
+            return self.model_.predict(X, **pred_args)
+
+    def _timed(self, phase):
+        """Returns a context manager timing `phase` if `profile` is set."""
+        if not self.profile:
+            return NOT_TIMED
+        return PhaseTimer(
+            self.__dict__.setdefault("timings_", {}),
+            phase,
+            hook=self.profile if callable(self.profile) else None,
         )
 
-        # predict with Keras model
-        y_pred = self.model_.predict(X, **pred_args)
+    def _can_predict_fast(self, X, pred_args):
+        """Checks if `X` can be used as-is by the traced prediction function.
+        """
+        X_shape_ = getattr(self, "X_shape_", None)
+        X_dtype_ = getattr(self, "X_dtype_", None)
+        if X_shape_ is None or X_dtype_ is None:
+            # preprocess_X was overridden and did not record
+            # the shape/dtype of the data seen in fit
+            return False
+        if not isinstance(X, np.ndarray) or X.dtype.kind == "O":
+            return False
+        if not isinstance(X_shape_, tuple):
+            # fit on multiple inputs
+            return False
+        if X.shape[1:] != tuple(X_shape_[1:]):
+            # let the regular path raise an informative error
+            return False
+        if X.dtype != X_dtype_:
+            # casting could truncate or wrap values (ex: floats for a model
+            # fit on uint8 data), the regular path passes them through as-is
+            return False
+        # Model.predict defaults to batches of 32 samples
+        return X.shape[0] <= (pred_args.get("batch_size") or 32)
+
+    def compile_predict(self):
+        """Traces the forward pass of the Keras model into a `tf.function`.
+
+        The function has a fixed input signature of shape
+        `(None, *X_shape_[1:])` and dtype `X_dtype_`, so it is only traced once.
+        It is cached on the estimator and rebuilt if the model is rebuilt.
+        It is never pickled.
 
-        # post process y
-        y, _ = self.postprocess_y(y_pred)
-        return y
+        Returns:
+            predict_function : tf.function
+                Callable mapping a batch of preprocessed inputs
+                to the raw outputs of the Keras model.
+        """
+        if not self.is_fitted_:
+            raise NotFittedError(
+                "Estimator needs to be fit before `compile_predict` " "can be called"
+            )
+        if not isinstance(getattr(self, "X_shape_", None), tuple) or not hasattr(
+            self, "X_dtype_"
+        ):
+            raise ValueError(
+                "`compile_predict` only supports models fit on a single array,"
+                " with the shape and dtype recorded in `X_shape_` and `X_dtype_`,"
+                " got X_shape_={}".format(getattr(self, "X_shape_", None))
+            )
+        input_spec = tf.TensorSpec(
+            shape=(None,) + tuple(self.X_shape_[1:]), dtype=tf.as_dtype(self.X_dtype_)
+        )
+        model = self.model_
+        cached = getattr(self, "_predict_function", None)
+        if cached is not None and cached[0] is model and cached[1] == input_spec:
+            return cached[2]
+
+        with _compile_predict_lock:
+            # another thread may have traced it in the meantime
+            cached = getattr(self, "_predict_function", None)
+            if cached is not None and cached[0] is model and cached[1] == input_spec:
+                return cached[2]
+
+            @tf.function(input_signature=[input_spec])
+            def predict_function(X):
+                return model(X, training=False)
+
+            self._predict_function = (model, input_spec, predict_function)
+        return predict_function
 
     def score(self, X, y, sample_weight=None):
         """Returns the mean accuracy on the given test data and labels.
@@ -745,7 +1533,8 @@ class BaseWrapper(BaseEstimator):
         """
         # validate sample weights
         if sample_weight is not None:
-            sample_weight = _check_sample_weight(sample_weight, X)
+            # checked against y, X can be a dict of inputs
+            sample_weight = _check_sample_weight(sample_weight, y)
 
         # validate y
         y = check_array(y, ensure_2d=False)
@@ -754,8 +1543,7 @@ class BaseWrapper(BaseEstimator):
         y_pred = self.predict(X)
 
         # filter kwargs and get attributes for score
-        params = self.get_params()
-        score_args = route_params(params, destination="score", pass_filter=set())
+        score_args = self._get_routed_params(destination="score", pass_filter=set())
 
         return self.scorer(y, y_pred, sample_weight=sample_weight, **score_args)
 
@@ -768,16 +1556,24 @@ class BaseWrapper(BaseEstimator):
         Dict[str, Any]
             Dictionary of meta parameters
         """
+        # parameters never start or end with "_", see `_get_param_names`
+        excluded = self._get_default_attrs() | self._transient_attrs
         return {
             k: v
             for k, v in self.__dict__.items()
-            if (
-                k not in type(self)().__dict__
-                and k not in self.get_params()
-                and (k.startswith("_") or k.endswith("_"))
-            )
+            if (k.startswith("_") or k.endswith("_")) and k not in excluded
         }
 
+    @classmethod
+    def _get_default_attrs(cls) -> frozenset:
+        """Names of the attributes set by `__init__` with default arguments.
+
+        These are collected once per class.
+        """
+        if "_default_attrs" not in cls.__dict__:
+            cls._default_attrs = frozenset(cls().__dict__)
+        return cls._default_attrs
+
     def set_params(self, **params) -> "BaseWrapper":
         """Override BaseEstimator.set_params to allow setting of routed params.
         """
@@ -792,6 +1588,92 @@ class BaseWrapper(BaseEstimator):
                 passthrough[param] = value
         return super().set_params(**passthrough)
 
+    def save(self, path: str):
+        """Saves the fitted estimator to the directory `path`.
+
+        The Keras model is saved in Keras' native format with `Model.save`
+        (in `path/model`), so that it can also be loaded on its own with
+        `tf.keras.models.load_model`, ex: by TensorFlow Serving.
+        The attributes set by `fit` (`classes_`, `n_features_in_`, encoders,
+        etc.) are pickled to `path/meta.pkl`. Parameters are not saved,
+        they are passed to `load`.
+
+        Arguments:
+            path : str
+                Directory to save to, created if it does not exist.
+                Previously saved files are overwritten.
+        """
+        if not self.is_fitted_:
+            raise NotFittedError("Estimator needs to be fit before it can be saved")
+        meta = self.get_meta()
+        model = meta.pop("model_")
+        # set by `__init__` from the parameters
+        meta.pop("_user_params", None)
+        os.makedirs(path, exist_ok=True)
+        model.save(os.path.join(path, "model"))
+        with open(os.path.join(path, "meta.pkl"), "wb") as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str, lazy: bool = False, **params) -> "BaseWrapper":
+        """Loads an estimator saved with `save`.
+
+        Arguments:
+            path : str
+                Directory the estimator was saved to.
+            lazy : bool, default False
+                If True, the Keras model is only loaded when first used,
+                for example by `predict`. The attributes set by `fit`,
+                including `classes_` and `n_features_in_`, are available
+                right away.
+            **params
+                Parameters of the estimator, ex: `batch_size` for `predict`.
+                They are needed to fit it again.
+
+        Returns:
+            estimator : BaseWrapper
+                The saved estimator, fitted.
+        """
+        with open(os.path.join(path, "meta.pkl"), "rb") as f:
+            meta = pickle.load(f)
+        estimator = cls(**params)
+        for attr, value in meta.items():
+            setattr(estimator, attr, value)
+        estimator._saved_model_path = os.path.abspath(path)
+        if not lazy:
+            estimator._load_model()
+        return estimator
+
+    def _load_model(self):
+        """Loads the Keras model of an estimator loaded with `load`."""
+        with _load_model_lock:
+            if "model_" not in self.__dict__:
+                model = tf.keras.models.load_model(
+                    os.path.join(self._saved_model_path, "model")
+                )
+                make_model_picklable(model)
+                self.model_ = model
+            self.__dict__.pop("_saved_model_path", None)
+        return self.model_
+
+    def __getattr__(self, name):
+        # only called for attributes that are not set
+        if name == "model_" and "_saved_model_path" in self.__dict__:
+            return self._load_model()
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(type(self).__name__, name)
+        )
+
+    def __getstate__(self):
+        """Drop transient caches before pickling."""
+        if "_saved_model_path" in self.__dict__:
+            self._load_model()
+        # a copy, on Python 3.11+ object.__getstate__ returns __dict__ itself
+        state = dict(super().__getstate__())
+        for attr in self._transient_attrs:
+            state.pop(attr, None)
+        return state
+
     def _get_param_names(self):
         """Get parameter names for the estimator"""
         return (
@@ -818,6 +1700,20 @@ class BaseWrapper(BaseEstimator):
 
 class KerasClassifier(BaseWrapper):
     """Implementation of the scikit-learn classifier API for Keras.
+
+    Arguments:
+        lazy_one_hot : bool, default=None
+            For outputs with a categorical crossentropy loss, keep the
+            integer class indices in memory and one-hot encode them one
+            batch at a time, instead of materializing `n_samples x n_classes`
+            targets. By default, this is only done when `X` is fed to Keras
+            batch by batch anyways (memory-mapped or sparse `X`). If True,
+            it is also done when the one-hot targets would take more memory
+            than `X`, in which case in-memory `X` is fed batch by batch too.
+            If False, targets are always encoded all at once. Targets are
+            always encoded all at once when `validation_split` is set.
+        **kwargs
+            See `BaseWrapper`.
     """
 
     _estimator_type = "classifier"
@@ -834,6 +1730,11 @@ class KerasClassifier(BaseWrapper):
         **BaseWrapper._tags,
     }
 
+    _wrapper_params = {
+        "lazy_one_hot",
+        *BaseWrapper._wrapper_params,
+    }
+
     _meta = {
         "n_classes_",
         "target_type_",
@@ -844,6 +1745,10 @@ class KerasClassifier(BaseWrapper):
         *BaseWrapper._meta,
     }
 
+    def __init__(self, model=None, *, lazy_one_hot=None, **kwargs):
+        super().__init__(model, **kwargs)
+        self.lazy_one_hot = lazy_one_hot
+
     @staticmethod
     def scorer(y_true, y_pred, **kwargs) -> float:
         """Accuracy score based on true and predicted target values.
@@ -966,6 +1871,24 @@ class KerasClassifier(BaseWrapper):
 
         return y, extra_args
 
+    def _get_decode_tables(self) -> list:
+        """Returns the class index -> original label lookup table of each
+        output, used to decode predictions without the encoders.
+
+        The tables are built from `classes_` and `y_dtype_` on first use
+        and cached until `classes_` changes, that is until the next fit.
+        """
+        classes_ = self.classes_
+        cached = _decode_tables.get(self)
+        if cached is not None and cached[0] is classes_:
+            return cached[1]
+        tables = [
+            np.asarray(class_, dtype=getattr(self, "y_dtype_", None))
+            for class_ in ([classes_] if self.n_outputs_ == 1 else classes_)
+        ]
+        _decode_tables[self] = (classes_, tables)
+        return tables
+
     def postprocess_y(self, y):
         """Reverts _pre_process_inputs to return predicted probabilites
              in formats sklearn likes as well as retrieving the original
@@ -974,69 +1897,63 @@ class KerasClassifier(BaseWrapper):
         if not isinstance(y, list):
             # convert single-target y to a list for easier processing
             y = [y]
+        else:
+            # outputs are replaced below, leave the caller's list untouched
+            y = list(y)
 
         target_type_ = self.target_type_
 
-        class_predictions = []
-
-        for i in range(self.n_outputs_):
-
-            if target_type_ == "binary":
-                # array([0.9, 0.1], [.2, .8]) -> array(['yes', 'no'])
-                if (
-                    isinstance(self.encoders_[i], LabelEncoder)
-                    and len(self.encoders_[i].classes_) == 1
-                ):
-                    # special case: single input label for sigmoid output
-                    # may give more predicted classes than inputs for
-                    # small sample sizes!
-                    # don't even bother inverse transforming, just fill.
-                    class_predictions.append(
-                        np.full(
-                            shape=(y[i].shape[0], 1),
-                            fill_value=self.encoders_[i].classes_[0],
-                        )
-                    )
-                else:
-                    y_ = y[i].round().astype(int)
-                    if y_.shape[1] == 1:
-                        # Appease the demands of sklearn transformers
-                        y_ = np.squeeze(y_, axis=1)
-                    class_predictions.append(self.encoders_[i].inverse_transform(y_))
-                if (
-                    len(y[i].shape) == 1
-                    or y[i].shape[1] == 1
-                    and len(self.encoders_[i].classes_) == 2
-                ):
-                    # result from a single sigmoid output
-                    # reformat so that we have 2 columns
-                    y[i] = np.column_stack([1 - y[i], y[i]])
-            elif target_type_ in ("multiclass", "multiclass-multioutput"):
+        # one row per output, decoded in place
+        class_predictions = np.empty((self.n_outputs_, y[0].shape[0]), self.y_dtype_)
+
+        for i, table in enumerate(self._get_decode_tables()):
+
+            single_column = y[i].ndim == 1 or y[i].shape[1] == 1
+
+            if table.size == 1:
+                # special case: single input label for sigmoid output
+                # may give more predicted classes than inputs for
+                # small sample sizes!
+                # don't even bother decoding, just fill.
+                class_predictions[i] = table[0]
+            elif single_column:
+                # single sigmoid output
+                # array([0.9], [.2]) -> array(['yes', 'no'])
+                idx = (y[i] > 0.5).reshape(-1).astype(np.intp)
+                np.take(table, idx, out=class_predictions[i])
+            else:
                 # array([0.8, 0.1, 0.1], [.1, .8, .1]) ->
                 # array(['apple', 'orange'])
-                idx = np.argmax(y[i], axis=-1)
-                y_ = np.zeros(y[i].shape, dtype=int)
-                y_[np.arange(y[i].shape[0]), idx] = 1
-                if y_.shape[1] == 1:
-                    # Appease the demands of sklearn transformers
-                    y_ = np.squeeze(y_, axis=1)
-                class_predictions.append(self.encoders_[i].inverse_transform(y_))
-            elif target_type_ == "multilabel-indicator":
-                class_predictions.append(
-                    self.encoders_[i].inverse_transform(np.argmax(y[i], axis=1))
-                )
+                np.take(table, np.argmax(y[i], axis=1), out=class_predictions[i])
 
-        class_probabilities = np.squeeze(np.column_stack(y))
+            if target_type_ == "binary" and (
+                y[i].ndim == 1 or y[i].shape[1] == 1 and table.size == 2
+            ):
+                # result from a single sigmoid output
+                # reformat so that we have 2 columns
+                y[i] = np.column_stack([1 - y[i], y[i]])
 
-        y = np.squeeze(np.column_stack(class_predictions))
+        class_probabilities = np.squeeze(np.column_stack(y))
 
-        # type cast back to input dtype
-        y = y.astype(self.y_dtype_, copy=False)
+        y = np.squeeze(class_predictions.T)
 
         extra_args = {"class_probabilities": class_probabilities}
 
         return y, extra_args
 
+    def _encode_y(self, y):
+        """Encodes `y` with the fitted `encoders_`, including the one-hot
+        encoding added for categorical crossentropy losses.
+        """
+        if self.target_type_ in ("multilabel-indicator", "multiclass-multioutput"):
+            y = [y[:, i] for i in range(y.shape[1])]
+        else:
+            y = [y.reshape(-1,)]
+        y = [encoder.transform(y_) for encoder, y_ in zip(self.encoders_, y)]
+        if len(y) == 1:
+            return y[0]
+        return tuple(np.squeeze(y_) for y_ in y)
+
     def _check_output_model_compatibility(self, y):
         """Checks that the model output number and loss functions match y.
         """
@@ -1046,19 +1963,36 @@ class KerasClassifier(BaseWrapper):
             losses = self.model_.loss
         else:
             losses = [self.model_.loss] * self.n_outputs_
+        # outputs encoded one batch at a time -> number of classes
+        lazy_outputs = dict()
         for i, loss in enumerate(losses):
-            if is_categorical_crossentropy(loss) and (
+            if keras_losses.is_categorical_crossentropy(loss) and (
                 y[i].ndim == 1 or y[i].shape[1] == 1
             ):
                 encoder = OneHotEncoder(sparse=False, dtype=np.uint8)
                 tf1dto2d = LabelDimensionTransformer()
                 y[i] = tf1dto2d.fit_transform(y[i])
-                y[i] = encoder.fit_transform(y[i])
+                if self.lazy_one_hot is not False:
+                    # materialized by `_fit` unless fed batch by batch
+                    encoder.fit(y[i])
+                    lazy_outputs[i] = encoder.categories_[0].size
+                else:
+                    y[i] = encoder.fit_transform(y[i])
                 self.encoders_[i] = make_pipeline(
                     self.encoders_[i], tf1dto2d, encoder, "passthrough",
                 )
 
-        return super()._check_output_model_compatibility(y)
+        y = super()._check_output_model_compatibility(y)
+        if not lazy_outputs:
+            return y
+        # class indices are in range(n_classes), like the columns
+        # of the one-hot encoding
+        if not isinstance(y, tuple):
+            return OneHotTargets(y.reshape(-1), lazy_outputs[0])
+        return tuple(
+            OneHotTargets(y_.reshape(-1), lazy_outputs[i]) if i in lazy_outputs else y_
+            for i, y_ in enumerate(y)
+        )
 
     def partial_fit(self, X, y, classes=None, sample_weight=None):
         """
@@ -1089,13 +2023,50 @@ class KerasClassifier(BaseWrapper):
         self.classes_ = classes  # TODO: don't swallow this param
         return super().partial_fit(X, y, sample_weight=sample_weight)
 
-    def predict_proba(self, X):
+    def predict_proba_iter(self, X, chunk_size=None):
+        """Yields class probability estimates chunk by chunk,
+        see `BaseWrapper.predict_iter`.
+
+        Arguments:
+            X : iterable of array-like or array-like
+                Iterable of chunks of test samples or, if `chunk_size`
+                is given, a single array-like to be split into chunks.
+            chunk_size : int, default None
+                Number of samples per chunk when `X` is a single array-like.
+
+        Yields:
+            proba: array-like, shape `(n_samples_chunk, n_outputs)`
+                Class probability estimates for each chunk.
+        """
+        for X_chunk in _iter_chunks(X, chunk_size):
+            yield self.predict_proba(X_chunk)
+
+    async def apredict_proba(self, X):
+        """Coroutine returning class probability estimates for the given
+        test data, computed like those of `apredict`.
+
+        Arguments:
+            X: array-like, shape `(n_samples, n_features)`
+                Test samples where `n_samples` is the number of samples
+                and `n_features` is the number of features.
+
+        Returns:
+            proba: array-like, shape `(n_samples, n_outputs)`
+                Class probability estimates, same as those of `predict_proba`.
+        """
+        batcher = self._get_batcher("predict_proba")
+        return await asyncio.wrap_future(batcher.submit(X))
+
+    def predict_proba(self, X, fast=False):
         """Returns class probability estimates for the given test data.
 
         Arguments:
             X: array-like, shape `(n_samples, n_features)`
                 Test samples where `n_samples` is the number of samples
                 and `n_features` is the number of features.
+            fast : bool, default False
+                Use the traced prediction function for small batches,
+                see `BaseWrapper.predict`.
 
         Returns:
             proba: array-like, shape `(n_samples, n_outputs)`
@@ -1105,28 +2076,16 @@ class KerasClassifier(BaseWrapper):
                 will return an array of shape `(n_samples, 2)`
                 (instead of `(n_sample, 1)` as in Keras).
         """
-        # check if fitted
-        if not self.is_fitted_:
-            raise NotFittedError(
-                "Estimator needs to be fit before `predict` " "can be called"
-            )
-
-        # basic input checks
-        X = self._validate_data(X=X, y=None, reset=False)
-
-        # pre process X
-        X, _ = self.preprocess_X(X)
-
-        # collect arguments
-        predict_args = route_params(
-            self.get_params(), destination="predict", pass_filter=self._predict_kwargs,
-        )
-
         # call the Keras model's predict
-        outputs = self.model_.predict(X, **predict_args)
+        outputs = self._predict_raw(X, fast=fast)
+
+        return self._decode_predict_proba(outputs)
 
+    def _decode_predict_proba(self, outputs):
+        """Returns class probabilities for raw outputs of the Keras model."""
         # join list of outputs into single output array
-        _, extra_args = self.postprocess_y(outputs)
+        with self._timed("postprocess_y"):
+            _, extra_args = self.postprocess_y(outputs)
 
         # get class probabilities from postprocess_y's output
         class_probabilities = extra_args["class_probabilities"]
@@ -0,0 +1,18 @@
+import tensorflow as tf
+
+
+def pytest_configure(config):
+    """Splits the CPU into 2 logical devices, to test `tf.distribute`
+    strategies with several replicas.
+
+    Logical devices can only be configured before TensorFlow's runtime
+    is initialized, that is before any test runs.
+    """
+    cpus = tf.config.list_physical_devices("CPU")
+    try:
+        tf.config.set_logical_device_configuration(
+            cpus[0], [tf.config.LogicalDeviceConfiguration()] * 2
+        )
+    except RuntimeError:
+        # initialized by a plugin, multi-replica tests are skipped
+        pass
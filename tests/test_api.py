@@ -5,7 +5,9 @@ from typing import Any, Dict
 
 import numpy as np
 import pytest
+import tensorflow as tf
 
+from sklearn.base import clone
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.datasets import load_boston, load_digits, load_iris
 from sklearn.ensemble import (
@@ -17,12 +19,14 @@ from sklearn.ensemble import (
 from sklearn.model_selection import GridSearchCV, RandomizedSearchCV
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
+from sklearn.utils import shuffle
 from tensorflow.keras.layers import Conv2D, Dense, Flatten, Input
 from tensorflow.keras.models import Model, Sequential
 from tensorflow.python import keras
 from tensorflow.python.keras import backend as K
 from tensorflow.python.keras.utils.np_utils import to_categorical
 
+from scikeras.batching import MicroBatcher
 from scikeras.wrappers import KerasClassifier, KerasRegressor
 
 from .mlp_models import dynamic_classifier, dynamic_regressor
@@ -557,3 +561,297 @@ def test_compile_model_from_params():
         )
         estimator.fit(X, y)
         assert estimator.model_.loss == myloss
+
+
+@pytest.mark.parametrize(
+    "config", ["MLPRegressor", "MLPClassifier", "CNNClassifierF"],
+)
+def test_predict_fast(config):
+    """Test that `predict(X, fast=True)` matches the regular
+    `Model.predict` based path and that the traced function is
+    not pickled.
+    """
+    loader, model, build_fn, _ = CONFIG[config]
+    data = loader()
+    X, y = data.data[:100], data.target[:100]
+    estimator = model(build_fn, model__hidden_layer_sizes=[])
+    estimator.fit(X, y)
+
+    # small batches use the traced function
+    np.testing.assert_allclose(
+        estimator.predict(X[:10], fast=True), estimator.predict(X[:10]), rtol=1e-5,
+    )
+    assert hasattr(estimator, "_predict_function")
+    # batches larger than batch_size fall back to Model.predict
+    np.testing.assert_allclose(
+        estimator.predict(X, fast=True), estimator.predict(X), rtol=1e-5
+    )
+    if hasattr(estimator, "predict_proba"):
+        np.testing.assert_allclose(
+            estimator.predict_proba(X[:10], fast=True),
+            estimator.predict_proba(X[:10]),
+            rtol=1e-5,
+        )
+
+    # the function is traced once
+    assert estimator.compile_predict() is estimator.compile_predict()
+
+    # traced functions are not picklable, they are dropped and re-traced
+    deserialized_estimator = pickle.loads(pickle.dumps(estimator))
+    assert not hasattr(deserialized_estimator, "_predict_function")
+    np.testing.assert_allclose(
+        deserialized_estimator.predict(X[:10], fast=True),
+        estimator.predict(X[:10]),
+        rtol=1e-5,
+    )
+
+
+def test_predict_fast_dtype():
+    """Inputs of another dtype than the training data are not cast,
+    they go through the regular path.
+    """
+    X = np.random.randint(0, 256, size=(50, 3)).astype(np.uint8)
+    y = np.random.uniform(size=(50,))
+    estimator = KerasRegressor(
+        dynamic_regressor, model__hidden_layer_sizes=(10,), verbose=0
+    ).fit(X, y)
+    X_scaled = np.array([[0.5, 0.25, 0.1], [-1.0, 0.0, 1.0]])
+    y_pred = estimator.predict(X_scaled)
+    np.testing.assert_allclose(estimator.predict(X_scaled, fast=True), y_pred)
+    assert not hasattr(estimator, "_predict_function")
+    with MicroBatcher(estimator) as batcher:
+        np.testing.assert_allclose(batcher(X_scaled), y_pred, rtol=1e-5)
+
+
+class TestFitStream:
+    """Tests fitting from streams of batches."""
+
+    def test_dataset(self):
+        """A `tf.data.Dataset` is iterated over once per epoch."""
+        data = load_iris()
+        X, y = shuffle(data.data, data.target, random_state=0)
+        dataset = tf.data.Dataset.from_tensor_slices((X, y)).batch(32)
+        clf = KerasClassifier(
+            model=dynamic_classifier, model__hidden_layer_sizes=(100,), epochs=2
+        )
+        clf.fit_stream(dataset, sample=(X, y))
+        assert clf.n_features_in_ == X.shape[1]
+        np.testing.assert_equal(clf.classes_, np.unique(y))
+        assert len(clf.history_["loss"]) == 2
+        assert clf.predict(X).shape == y.shape
+        assert clf.predict_proba(X).shape == (X.shape[0], 3)
+
+    def test_generator_function(self):
+        """Callables are called once per epoch and can return generators.
+        Without a `sample`, the first batch is used.
+        """
+        data = load_boston()
+        X, y = data.data[:100], data.target[:100]
+
+        def batches():
+            for start in range(0, X.shape[0], 20):
+                yield X[start : start + 20], y[start : start + 20]
+
+        reg = KerasRegressor(
+            model=dynamic_regressor, model__hidden_layer_sizes=(100,), epochs=3
+        )
+        reg.fit_stream(batches)
+        assert reg.X_shape_ == (20, X.shape[1])
+        assert len(reg.history_["loss"]) == 3
+        assert reg.predict(X).shape == y.shape
+
+    def test_one_shot_iterator(self):
+        data = load_boston()
+        X, y = data.data[:100], data.target[:100]
+        reg = KerasRegressor(model=dynamic_regressor, model__hidden_layer_sizes=(100,))
+        with pytest.raises(TypeError, match="can only be iterated over once"):
+            reg.fit_stream(iter([(X, y)]))
+
+    def test_unseen_class(self):
+        """Labels missing from the sample can not be encoded."""
+        X = np.random.uniform(size=(20, 3))
+        y = np.array([0, 1] * 5 + [2] * 10)
+        clf = KerasClassifier(
+            model=dynamic_classifier, model__hidden_layer_sizes=(100,)
+        )
+        with pytest.raises(Exception, match="unseen labels"):
+            clf.fit_stream([(X[:10], y[:10]), (X[10:], y[10:])])
+
+    def test_validation_split(self):
+        """`validation_split` is rejected, including when routed to `fit`."""
+        X, y = np.random.uniform(size=(20, 3)), np.random.uniform(size=(20,))
+        for params in [{"validation_split": 0.2}, {"fit__validation_split": 0.2}]:
+            reg = KerasRegressor(
+                model=dynamic_regressor, model__hidden_layer_sizes=(10,), **params
+            )
+            with pytest.raises(ValueError, match="not supported by `fit_stream`"):
+                reg.fit_stream([(X, y)])
+
+    def test_timings(self):
+        """Timings of the previous model are cleared by a new model."""
+        X, y = np.random.uniform(size=(20, 3)), np.random.uniform(size=(20,))
+        reg = KerasRegressor(
+            model=dynamic_regressor, model__hidden_layer_sizes=(10,), profile=True
+        )
+        reg.fit(X, y).predict(X)
+        assert "model_predict" in reg.timings_
+        reg.fit_stream([(X, y)])
+        assert "model_predict" not in reg.timings_
+
+
+def _mirrored_strategy():
+    """Mirrors variables across the 2 logical CPU devices
+    configured in `conftest.py`.
+    """
+    devices = [d.name for d in tf.config.list_logical_devices("CPU")]
+    if len(devices) < 2:
+        pytest.skip("TensorFlow's runtime was initialized before conftest.py")
+    return tf.distribute.MirroredStrategy(devices[:2])
+
+
+class TestDistribution:
+    """Tests training with `tf.distribute` strategies."""
+
+    @pytest.mark.parametrize("config", ["MLPRegressor", "MLPClassifier"])
+    def test_strategy_scope(self, config):
+        """Models are built and compiled within the strategy's scope."""
+        loader, model, build_fn, _ = CONFIG[config]
+        data = loader()
+        X, y = data.data[:100], data.target[:100]
+        estimator = model(
+            build_fn,
+            model__hidden_layer_sizes=(100,),
+            distribution=_mirrored_strategy,
+            batch_size=20,
+            epochs=2,
+        )
+        estimator.fit(X, y)
+        strategy = estimator.model_.distribute_strategy
+        assert isinstance(strategy, tf.distribute.MirroredStrategy)
+        assert strategy.num_replicas_in_sync == 2
+        assert strategy.extended.variable_created_in_scope(
+            estimator.model_.trainable_variables[0]
+        )
+        assert estimator.predict(X).shape == y.shape
+
+        # strategies and factories are both accepted
+        estimator.set_params(distribution=strategy)
+        estimator.fit(X, y)
+        assert estimator.model_.distribute_strategy is strategy
+
+        # factories can be cloned
+        clone(estimator.set_params(distribution=_mirrored_strategy)).fit(X, y)
+
+    def test_memmap_and_stream(self, tmp_path):
+        """Batches streamed from generators are distributed."""
+        data = load_boston()
+        X, y = data.data[:100], data.target[:100]
+        X_memmap = np.memmap(
+            tmp_path / "X.dat", dtype=X.dtype, mode="w+", shape=X.shape
+        )
+        X_memmap[:] = X
+        reg = KerasRegressor(
+            model=dynamic_regressor,
+            model__hidden_layer_sizes=(100,),
+            distribution=_mirrored_strategy,
+            batch_size=20,
+        )
+        reg.fit(X_memmap, y)
+        assert reg.predict(X).shape == y.shape
+        reg.fit_stream([(X[:50], y[:50]), (X[50:], y[50:])])
+        assert reg.predict(X).shape == y.shape
+
+    def test_not_cached(self):
+        X = np.random.uniform(size=(20, 3))
+        y = np.random.uniform(size=(20,))
+        reg = KerasRegressor(
+            model=dynamic_regressor,
+            model__hidden_layer_sizes=(100,),
+            distribution=_mirrored_strategy,
+            model_cache=True,
+        )
+        reg.fit(X, y)
+        first_model = reg.model_
+        reg.fit(X, y)
+        assert reg.model_ is not first_model
+
+    def test_invalid(self):
+        X = np.random.uniform(size=(20, 3))
+        y = np.random.uniform(size=(20,))
+        reg = KerasRegressor(
+            model=dynamic_regressor,
+            model__hidden_layer_sizes=(100,),
+            distribution="mirrored",
+        )
+        with pytest.raises(TypeError, match="tf.distribute.Strategy"):
+            reg.fit(X, y)
+
+
+@pytest.mark.parametrize("config", ["MLPRegressor", "MLPClassifier"])
+def test_profile(config):
+    """Phases of `fit` and `predict` are timed and reported to the hook."""
+    loader, model, build_fn, _ = CONFIG[config]
+    data = loader()
+    X, y = data.data[:100], data.target[:100]
+    events = []
+    estimator = model(
+        build_fn,
+        model__hidden_layer_sizes=(100,),
+        profile=lambda phase, seconds: events.append((phase, seconds)),
+    )
+    estimator.fit(X, y)
+    # models compiled by the build function are timed as part of `build_model`
+    fit_phases = {
+        "validate_data",
+        "preprocess_X",
+        "preprocess_y",
+        "build_model",
+        "model_fit",
+    }
+    assert set(estimator.timings_) == fit_phases
+    assert all(seconds >= 0 for seconds in estimator.timings_.values())
+    assert {phase for phase, _ in events} == fit_phases
+
+    estimator.predict(X)
+    estimator.predict(X[:1], fast=True)
+    assert set(estimator.timings_) == fit_phases | {"model_predict", "postprocess_y"}
+    for phase in estimator.timings_:
+        np.testing.assert_allclose(
+            estimator.timings_[phase],
+            sum(seconds for p, seconds in events if p == phase),
+        )
+    # timings are not meta parameters and are not pickled
+    assert "timings_" not in estimator.get_meta()
+    unpickled = pickle.loads(pickle.dumps(estimator.set_params(profile=True)))
+    assert not hasattr(unpickled, "timings_")
+    # a new model is timed from scratch
+    estimator.fit(X, y)
+    assert set(estimator.timings_) == fit_phases
+
+    # profiling is disabled by default
+    estimator = model(build_fn, model__hidden_layer_sizes=(100,))
+    estimator.fit(X, y).predict(X)
+    assert not hasattr(estimator, "timings_")
+
+
+@pytest.mark.parametrize("config", ["MLPRegressor", "MLPClassifier"])
+def test_predict_iter(config):
+    """Test that chunked predictions match predictions on the whole data."""
+    loader, model, build_fn, _ = CONFIG[config]
+    data = loader()
+    X, y = data.data[:100], data.target[:100]
+    estimator = model(build_fn, model__hidden_layer_sizes=[])
+    estimator.fit(X, y)
+
+    chunks = list(estimator.predict_iter(X, chunk_size=30))
+    assert [chunk.shape[0] for chunk in chunks] == [30, 30, 30, 10]
+    np.testing.assert_allclose(np.concatenate(chunks), estimator.predict(X))
+    # iterables of chunks are used as-is
+    chunks = estimator.predict_iter(X_chunk for X_chunk in np.array_split(X, 4))
+    np.testing.assert_allclose(np.concatenate(list(chunks)), estimator.predict(X))
+
+    if hasattr(estimator, "predict_proba_iter"):
+        chunks = list(estimator.predict_proba_iter(X, chunk_size=30))
+        np.testing.assert_allclose(
+            np.concatenate(chunks), estimator.predict_proba(X), rtol=1e-5
+        )
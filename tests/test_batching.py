@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from sklearn.exceptions import NotFittedError
+
+from scikeras.batching import MicroBatcher
+from scikeras.wrappers import KerasClassifier, KerasRegressor
+
+from .mlp_models import dynamic_classifier, dynamic_regressor
+
+
+N_FEATURES = 4
+
+
+@pytest.fixture(scope="module")
+def multilabel_classifier():
+    X = np.random.uniform(size=(100, N_FEATURES))
+    y = np.random.randint(0, 2, size=(100, 3))
+    return KerasClassifier(
+        dynamic_classifier, model__hidden_layer_sizes=(10,), verbose=0
+    ).fit(X, y)
+
+
+def _run_concurrently(func, requests):
+    """Calls `func` on all `requests` at once from separate threads."""
+    barrier = threading.Barrier(len(requests))
+
+    def call(X):
+        barrier.wait()
+        return func(X)
+
+    with ThreadPoolExecutor(len(requests)) as executor:
+        return list(executor.map(call, requests))
+
+
+def _run_coroutine(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_concurrent_predict(multilabel_classifier):
+    """The inference path can be used concurrently, and does not modify
+    the outputs of the Keras model in place.
+    """
+    clf = multilabel_classifier
+    requests = [np.random.uniform(size=(n, N_FEATURES)) for n in range(1, 9)]
+    expected = [clf.predict_proba(X) for X in requests]
+    for fast in (False, True):
+        results = _run_concurrently(lambda X: clf.predict_proba(X, fast=fast), requests)
+        for result, expected_result in zip(results, expected):
+            np.testing.assert_allclose(result, expected_result, rtol=1e-5)
+
+    outputs = clf._predict_raw(requests[0])
+    shapes = [output.shape for output in outputs]
+    clf.postprocess_y(outputs)
+    assert [output.shape for output in outputs] == shapes
+
+
+def test_concurrent_profile(multilabel_classifier):
+    """Timings of concurrent predictions are all recorded."""
+    clf = multilabel_classifier
+    requests = [np.random.uniform(size=(n, N_FEATURES)) for n in range(1, 17)]
+    phases = []
+    clf.set_params(profile=lambda phase, seconds: phases.append((phase, seconds)))
+    clf.__dict__.pop("timings_", None)
+    try:
+        for fast in (False, True):
+            _run_concurrently(lambda X: clf.predict_proba(X, fast=fast), requests)
+    finally:
+        clf.set_params(profile=False)
+    assert {phase for phase, _ in phases} == set(clf.timings_)
+    for phase, total in clf.timings_.items():
+        assert total == pytest.approx(sum(s for p, s in phases if p == phase))
+
+
+@pytest.mark.parametrize("method", ["predict", "predict_proba"])
+def test_micro_batcher(multilabel_classifier, method):
+    """Concurrent requests are coalesced into fewer model calls and get
+    the same results as if they were run one by one.
+    """
+    clf = multilabel_classifier
+    requests = [np.random.uniform(size=(n, N_FEATURES)) for n in range(1, 9)]
+    expected = [getattr(clf, method)(X) for X in requests]
+    model_calls = []
+    clf.set_params(profile=lambda phase, _: model_calls.append(phase))
+    try:
+        with MicroBatcher(clf, method=method, max_delay_s=0.5) as batcher:
+            results = _run_concurrently(batcher, requests)
+    finally:
+        clf.set_params(profile=False)
+    for result, expected_result in zip(results, expected):
+        np.testing.assert_allclose(result, expected_result, rtol=1e-5)
+    assert 0 < model_calls.count("model_predict") < len(requests)
+
+
+def test_max_batch_size():
+    X = np.random.uniform(size=(100, N_FEATURES))
+    y = np.random.uniform(size=(100,))
+    reg = KerasRegressor(
+        dynamic_regressor, model__hidden_layer_sizes=(10,), verbose=0
+    ).fit(X, y)
+    model_calls = []
+    reg.set_params(profile=lambda phase, _: model_calls.append(phase))
+    requests = [X[i : i + 3] for i in range(0, 24, 3)]
+    with MicroBatcher(reg, max_batch_size=6, max_delay_s=0.5) as batcher:
+        results = _run_concurrently(batcher, requests)
+        # at most 2 requests of 3 samples per model call
+        assert model_calls.count("model_predict") >= len(requests) // 2
+        # large requests are not batched
+        np.testing.assert_allclose(batcher(X), reg.predict(X), rtol=1e-5)
+    for result, X_request in zip(results, requests):
+        np.testing.assert_allclose(result, reg.predict(X_request), rtol=1e-5)
+
+
+def test_errors(multilabel_classifier):
+    with pytest.raises(ValueError, match="method"):
+        MicroBatcher(multilabel_classifier, method="fit")
+
+    clf = KerasClassifier(dynamic_classifier, model__hidden_layer_sizes=(10,))
+    with MicroBatcher(clf) as batcher:
+        with pytest.raises(NotFittedError):
+            batcher(np.zeros((1, N_FEATURES)))
+        with pytest.raises(NotFittedError):
+            _run_coroutine(clf.apredict(np.zeros((1, N_FEATURES))))
+
+    with MicroBatcher(multilabel_classifier) as batcher:
+        # invalid requests fail on their own
+        with pytest.raises(ValueError, match="features"):
+            batcher(np.zeros((1, N_FEATURES + 1)))
+        assert batcher(np.zeros((1, N_FEATURES))).shape == (3,)
+    with pytest.raises(RuntimeError, match="closed"):
+        batcher(np.zeros((1, N_FEATURES)))
+
+
+def test_idle_timeout(multilabel_classifier):
+    """The background thread stops when idle and restarts on demand."""
+    batcher = MicroBatcher(multilabel_classifier, idle_timeout_s=0.05)
+    X = np.zeros((1, N_FEATURES))
+    batcher(X)
+    time.sleep(0.5)
+    assert batcher._thread is None
+    np.testing.assert_equal(batcher(X), multilabel_classifier.predict(X))
+    batcher.close()
+
+
+def test_cancel(multilabel_classifier):
+    """Cancelled requests are skipped."""
+    with MicroBatcher(multilabel_classifier, max_delay_s=0.5) as batcher:
+        futures = [batcher.submit(np.zeros((1, N_FEATURES))) for _ in range(3)]
+        assert futures[1].cancel()
+        assert futures[0].result().shape == futures[2].result().shape == (3,)
+
+
+@pytest.mark.parametrize("method", ["apredict", "apredict_proba"])
+def test_async_predict(multilabel_classifier, method):
+    """Concurrent coroutines share model calls."""
+    clf = multilabel_classifier
+    requests = [np.random.uniform(size=(n, N_FEATURES)) for n in range(1, 9)]
+    expected = [getattr(clf, method[1:])(X) for X in requests]
+    model_calls = []
+    clf.set_params(
+        profile=lambda phase, _: model_calls.append(phase), max_batch_delay_s=0.5
+    )
+
+    async def predict_all():
+        return await asyncio.gather(*(getattr(clf, method)(X) for X in requests))
+
+    try:
+        results = _run_coroutine(predict_all())
+    finally:
+        clf.set_params(profile=False, max_batch_delay_s=0.002)
+    for result, expected_result in zip(results, expected):
+        np.testing.assert_allclose(result, expected_result, rtol=1e-5)
+    assert 0 < model_calls.count("model_predict") < len(requests)
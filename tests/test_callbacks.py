@@ -1,5 +1,8 @@
 import pickle
 
+import numpy as np
+import pytest
+
 from sklearn.utils.estimator_checks import (
     check_estimators_partial_fit_n_features,  # noqa
 )
@@ -42,3 +45,114 @@ def test_callbacks():
     deserialized_estimator = pickle.loads(serialized_estimator)
     assert deserialized_estimator.callbacks[0].called == estimator.callbacks[0].called
     estimator.fit([[0]], [1])  # quick fit
+
+
+class BatchCounter(Callback):
+    """Counts training batches."""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.batches += 1
+
+
+class TestTrainingBudget:
+    """Tests the `max_samples` and `max_time_s` budgets."""
+
+    @pytest.mark.parametrize("memmap", [False, True])
+    def test_max_samples(self, memmap, tmp_path):
+        """Training stops mid-epoch once `max_samples` samples were seen."""
+        X = np.random.uniform(size=(100, 4))
+        y = np.random.randint(0, 2, size=(100,))
+        if memmap:
+            X_memmap = np.memmap(
+                tmp_path / "X.dat", dtype=X.dtype, mode="w+", shape=X.shape
+            )
+            X_memmap[:] = X
+            X = X_memmap
+        counter = BatchCounter()
+        clf = KerasClassifier(
+            model=dynamic_classifier,
+            model__hidden_layer_sizes=(10,),
+            callbacks=[counter],
+            batch_size=10,
+            epochs=10,
+            max_samples=250,
+        )
+        clf.fit(X, y)
+        assert counter.batches == 25
+        assert len(clf.history_["loss"]) == 3
+        # the user's callbacks are left as is
+        assert clf.callbacks == [counter]
+
+        # the budget applies to each call, training continues
+        clf.partial_fit(X, y)
+        assert counter.batches == 50
+        assert len(clf.history_["loss"]) == 6
+
+    def test_max_samples_validation_split(self):
+        """Held out samples do not count."""
+        X = np.random.uniform(size=(100, 4))
+        y = np.random.randint(0, 2, size=(100,))
+        counter = BatchCounter()
+        clf = KerasClassifier(
+            model=dynamic_classifier,
+            model__hidden_layer_sizes=(10,),
+            callbacks=[counter],
+            batch_size=10,
+            epochs=10,
+            validation_split=0.2,
+            max_samples=200,
+        )
+        clf.fit(X, y)
+        assert counter.batches == 20
+
+    def test_max_time_s(self):
+        X = np.random.uniform(size=(100, 4))
+        y = np.random.randint(0, 2, size=(100,))
+        counter = BatchCounter()
+        clf = KerasClassifier(
+            model=dynamic_classifier,
+            model__hidden_layer_sizes=(10,),
+            callbacks=[counter],
+            batch_size=10,
+            epochs=100,
+            max_time_s=0,
+        )
+        clf.fit(X, y)
+        assert counter.batches == 1
+
+    def test_fit_stream(self):
+        X = np.random.uniform(size=(100, 4))
+        y = np.random.randint(0, 2, size=(100,))
+        clf = KerasClassifier(
+            model=dynamic_classifier, model__hidden_layer_sizes=(10,), max_samples=50
+        )
+        with pytest.raises(ValueError, match="max_samples"):
+            clf.fit_stream([(X, y)])
+
+    def test_successive_halving(self):
+        pytest.importorskip("sklearn.experimental.enable_halving_search_cv")
+        from sklearn.model_selection import HalvingGridSearchCV
+
+        X = np.random.uniform(size=(100, 4))
+        y = np.random.randint(0, 2, size=(100,))
+        clf = KerasClassifier(
+            model=dynamic_classifier,
+            model__hidden_layer_sizes=(10,),
+            epochs=100,
+            verbose=0,
+        )
+        search = HalvingGridSearchCV(
+            clf,
+            {"model__hidden_layer_sizes": [(10,), (20,), (30,), (40,)]},
+            resource="max_samples",
+            min_resources=80,
+            max_resources=320,
+            factor=2,
+            cv=2,
+        )
+        search.fit(X, y)
+        assert set(search.cv_results_["param_max_samples"]) == {80, 160, 320}
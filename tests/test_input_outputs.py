@@ -2,11 +2,12 @@ from typing import Any, Dict
 
 import numpy as np
 import pytest
+import scipy.sparse
 import tensorflow as tf
 
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.preprocessing import MultiLabelBinarizer
-from tensorflow.python.keras.layers import Concatenate, Dense, Input
+from tensorflow.python.keras.layers import Concatenate, Dense, Embedding, Input
 from tensorflow.python.keras.models import Model, Sequential
 from tensorflow.python.keras.testing_utils import get_test_data
 
@@ -152,6 +153,32 @@ def test_multi_input():
     clf.score(x_train, y_train)
 
 
+def test_multi_input_predict_fast():
+    """Inputs split by `preprocess_X` fall back to the regular
+    prediction path without being preprocessed twice.
+    """
+
+    class RecordingMultiInputClassifier(FunctionalAPIMultiInputClassifier):
+        def preprocess_X(self, X):
+            X_split, _ = super().preprocess_X(X)
+            return X_split, {"X_dtype_": X.dtype, "X_shape_": X.shape}
+
+    (x_train, y_train), _ = get_test_data(
+        train_samples=TRAIN_SAMPLES, test_samples=0, input_shape=(4,), num_classes=3,
+    )
+    clf = RecordingMultiInputClassifier().fit(x_train, y_train)
+    np.testing.assert_allclose(
+        clf.predict_proba(x_train[:5], fast=True),
+        clf.predict_proba(x_train[:5]),
+        rtol=1e-5,
+    )
+
+    # the traced function takes a single array
+    clf = FunctionalAPIMultiInputClassifier().fit(x_train, y_train)
+    with pytest.raises(ValueError, match="single array"):
+        clf.compile_predict()
+
+
 def test_multi_output():
     """Compares to scikit-learn RandomForestClassifier classifier.
     """
@@ -197,6 +224,10 @@ def test_multi_label_clasification():
 
     assert y_pred_keras.shape == y_pred_sklearn.shape
 
+    # each label is decoded from its own sigmoid output
+    y_proba = np.column_stack(clf_keras.model_.predict(x_train))
+    np.testing.assert_array_equal(y_pred_keras, y_proba > 0.5)
+
 
 def test_multi_output_regression():
     """Compares to scikit-learn RandomForestRegressor.
@@ -247,6 +278,32 @@ def test_incompatible_output_dimensions():
         clf.fit(X, y)
 
 
+@pytest.mark.parametrize("y_dtype", ["int64", "float32", "str"])
+def test_KerasClassifier_postprocess_y(y_dtype):
+    """Checks that KerasClassifier.postprocess_y decodes
+    probabilities into the original classes.
+    """
+    clf = KerasClassifier(model=dynamic_classifier, model__hidden_layer_sizes=(10,))
+    classes = np.array([3, 1, 2]).astype(y_dtype)
+    clf.fit(np.random.uniform(size=(30, 4)), np.tile(classes, 10))
+
+    proba = np.array([[0.1, 0.1, 0.8], [0.7, 0.2, 0.1], [0.2, 0.5, 0.3]])
+    y_pred, extra_args = clf.postprocess_y(proba)
+    np.testing.assert_array_equal(y_pred, np.sort(classes)[[2, 0, 1]])
+    assert y_pred.dtype == classes.dtype
+    np.testing.assert_array_equal(extra_args["class_probabilities"], proba)
+    # lookup tables are cached outside of the estimator
+    assert not any("decode" in attr for attr in vars(clf))
+
+    # and are rebuilt for the classes of the new fit
+    clf.fit(np.random.uniform(size=(30, 4)), np.tile(classes[:2], 15))
+    y_pred, extra_args = clf.postprocess_y(np.array([[0.2], [0.9], [0.5]]))
+    np.testing.assert_array_equal(y_pred, np.sort(classes[:2])[[0, 1, 0]])
+    np.testing.assert_allclose(
+        extra_args["class_probabilities"], [[0.8, 0.2], [0.1, 0.9], [0.5, 0.5]]
+    )
+
+
 def test_BaseWrapper_postprocess_y():
     """Checks BaseWrapper.postprocess_y.
 
@@ -363,3 +420,216 @@ def test_mixed_dtypes(y_dtype, X_dtype, run_eagerly):
         assert y_hat.dtype == np.dtype(y_dtype)
     else:
         assert y_hat.dtype.kind == "f"
+
+
+def test_memmap(tmp_path):
+    """Memory-mapped inputs are validated without copies
+    and fed to Keras one batch at a time.
+    """
+    X, y = np.random.uniform(size=(100, 4)), np.random.uniform(size=(100,))
+    X_mm = np.lib.format.open_memmap(
+        str(tmp_path / "X.npy"), mode="w+", dtype=X.dtype, shape=X.shape
+    )
+    X_mm[:] = X
+    X_mm.flush()
+    X_mm = np.load(str(tmp_path / "X.npy"), mmap_mode="r")
+    sample_weight = np.ones(X.shape[0])
+    sample_weight[::2] = 0
+
+    class StrictRegressor(KerasRegressor):
+        def _fit_keras_model(self, X, y, sample_weight, warm_start):
+            assert isinstance(X, tf.data.Dataset)
+            assert y is None and sample_weight is None
+            n_samples = sum(batch[0].shape[0] for batch in X)
+            assert n_samples == 50
+            return super()._fit_keras_model(X, y, sample_weight, warm_start)
+
+    params = dict(
+        model=dynamic_regressor,
+        model__hidden_layer_sizes=(10,),
+        random_state=0,
+        shuffle=False,
+        batch_size=8,
+        epochs=2,
+        optimizer="sgd",
+    )
+    reg = StrictRegressor(**params)
+    assert np.shares_memory(reg._validate_data(X_mm), X_mm)
+
+    reg.fit(X_mm, y, sample_weight=sample_weight)
+    ref = KerasRegressor(**params).fit(X, y, sample_weight=sample_weight)
+    np.testing.assert_allclose(reg.predict(X), ref.predict(X), rtol=1e-5)
+
+
+def test_sparse():
+    """Sparse matrices are fed to Keras as batches of sparse tensors."""
+    X = scipy.sparse.random(100, 40, density=0.05, format="csr", random_state=0)
+    y = np.random.uniform(size=(100,))
+
+    def build_fn(sparse, meta):
+        inp = Input(shape=(meta["n_features_in_"],), sparse=sparse)
+        out = Dense(1)(Dense(10, activation="relu")(inp))
+        return Model(inp, out)
+
+    class StrictRegressor(KerasRegressor):
+        def _fit_keras_model(self, X, y, sample_weight, warm_start):
+            assert isinstance(X, tf.data.Dataset)
+            for X_batch, _ in X:
+                assert isinstance(X_batch, tf.SparseTensor)
+            return super()._fit_keras_model(X, y, sample_weight, warm_start)
+
+    params = dict(
+        model=build_fn,
+        random_state=0,
+        shuffle=False,
+        batch_size=8,
+        epochs=2,
+        loss="mse",
+        optimizer="sgd",
+    )
+    reg = StrictRegressor(model__sparse=True, **params)
+    assert reg._validate_data(X.tocsc()).format == "csr"
+
+    reg.fit(X, y)
+    ref = KerasRegressor(model__sparse=False, **params).fit(X.toarray(), y)
+    y_pred = reg.predict(X)
+    np.testing.assert_allclose(y_pred, ref.predict(X.toarray()), rtol=1e-4)
+    np.testing.assert_allclose(reg.predict(X, fast=True), y_pred)
+
+    # Keras can not split off validation data
+    reg.set_params(validation_split=0.2)
+    with pytest.raises(ValueError, match="validation_split"):
+        reg.fit(X, y)
+
+
+def test_dataframe():
+    """Data frames are read into a single array, recording column names."""
+    pd = pytest.importorskip("pandas")
+    X = pd.DataFrame(
+        {
+            "a": np.arange(20),
+            "b": np.random.uniform(size=20).astype("float32"),
+            "c": np.random.uniform(size=20) > 0.5,
+        }
+    )
+    y = np.random.uniform(size=20)
+    reg = KerasRegressor(dynamic_regressor, model__hidden_layer_sizes=(10,))
+
+    # mixed dtypes are cast to floatx instead of going through object arrays
+    X_validated = reg._validate_data(X)
+    assert X_validated.dtype == tf.keras.backend.floatx()
+    np.testing.assert_array_equal(X_validated, X.to_numpy(dtype="float32"))
+    # columns of the same dtype keep it, and are not copied
+    X_same = X[["a"]].copy()
+    X_validated = reg._validate_data(X_same)
+    assert X_validated.dtype == X["a"].dtype
+    assert np.shares_memory(X_validated, X_same.to_numpy())
+
+    reg.fit(X, y)
+    np.testing.assert_array_equal(reg.feature_names_in_, ["a", "b", "c"])
+    np.testing.assert_allclose(reg.predict(X), reg.predict(X.to_numpy("float32")))
+    with pytest.raises(ValueError, match="feature names"):
+        reg.predict(X[["b", "a", "c"]])
+
+    # column names are only recorded for data frames with string names
+    reg.fit(X.set_axis([0, 1, 2], axis=1), y)
+    assert not hasattr(reg, "feature_names_in_")
+
+
+def test_arrow_table():
+    pa = pytest.importorskip("pyarrow")
+    X = pa.table({"a": np.arange(20), "b": np.random.uniform(size=20)})
+    y = np.random.uniform(size=20)
+    reg = KerasRegressor(dynamic_regressor, model__hidden_layer_sizes=(10,))
+    reg.fit(X, y)
+    np.testing.assert_array_equal(reg.feature_names_in_, ["a", "b"])
+    assert reg.predict(X).shape == (20,)
+
+
+def test_multi_input_dict():
+    """Inputs of multi-input models are validated separately
+    and fed to Keras as-is, keeping their dtypes.
+    """
+    n = 50
+    X = {
+        "num": np.random.uniform(size=(n, 3)),
+        "ids": np.random.randint(0, 10, size=(n,)),
+    }
+    y = np.random.randint(0, 2, size=(n,))
+
+    def build_fn(meta):
+        assert meta["n_features_in_"] == {"num": 3, "ids": 1}
+        num = Input((3,), name="num")
+        ids = Input((), name="ids", dtype="int64")
+        embedded = Embedding(10, 2)(ids)
+        out = Dense(1, activation="sigmoid")(Concatenate()([num, embedded]))
+        return Model({"num": num, "ids": ids}, out)
+
+    clf = KerasClassifier(build_fn, loss="binary_crossentropy")
+    sample_weight = np.ones(n)
+    sample_weight[::2] = 0
+    clf.fit(X, y, sample_weight=sample_weight)
+    assert clf.X_dtype_ == {"num": np.float64, "ids": X["ids"].dtype}
+    assert clf.predict(X).shape == (n,)
+    clf.score(X, y)
+    clf.score(X, y, sample_weight=sample_weight)
+
+    # inputs are checked separately
+    with pytest.raises(ValueError, match="features"):
+        clf.predict({"num": X["num"]})
+    with pytest.raises(ValueError, match="inconsistent numbers of samples"):
+        clf.fit(X, y[:-1])
+
+
+def test_list_of_rows():
+    """Lists of 1D arrays are samples, not the inputs of a multi-input model."""
+    X = np.random.uniform(size=(20, 3))
+    y = np.random.uniform(size=(20,))
+    reg = KerasRegressor(
+        dynamic_regressor, model__hidden_layer_sizes=(10,), verbose=0
+    ).fit(list(X), y)
+    assert reg.n_features_in_ == 3
+    np.testing.assert_allclose(reg.predict([X[0]]), reg.predict(X[:1]), rtol=1e-5)
+    np.testing.assert_allclose(reg.predict(list(X)), reg.predict(X), rtol=1e-5)
+
+
+def test_lazy_one_hot():
+    """With `lazy_one_hot=True`, one-hot targets larger than X are encoded
+    one batch at a time.
+    """
+    n_classes = 20
+    y = np.random.permutation(np.arange(100) % n_classes)
+    fed_datasets = []
+
+    class RecordingClassifier(KerasClassifier):
+        def _fit_keras_model(self, X, y, sample_weight, warm_start):
+            fed_datasets.append(isinstance(X, tf.data.Dataset))
+            if isinstance(X, tf.data.Dataset):
+                _, y_batch = next(iter(X))
+                assert y_batch.shape == (8, n_classes)
+            return super()._fit_keras_model(X, y, sample_weight, warm_start)
+
+    params = dict(
+        model=dynamic_classifier,
+        model__hidden_layer_sizes=(10,),
+        loss="categorical_crossentropy",
+        random_state=0,
+        shuffle=False,
+        batch_size=8,
+        optimizer="sgd",
+    )
+    # 8 bytes of features and 20 bytes of one-hot targets per sample
+    X = np.random.uniform(size=(100, 2)).astype("float32")
+    clf = RecordingClassifier(lazy_one_hot=True, **params).fit(X, y)
+    ref = RecordingClassifier(lazy_one_hot=False, **params).fit(X, y)
+    assert fed_datasets == [True, False]
+    np.testing.assert_allclose(clf.predict_proba(X), ref.predict_proba(X), rtol=1e-5)
+    assert clf.encoders_[0].transform(y[:5]).shape == (5, n_classes)
+
+    # in-memory X is only fed batch by batch if requested,
+    # no memory is saved with large X, validation data can't be split
+    RecordingClassifier(**params).fit(X, y)
+    params["lazy_one_hot"] = True
+    RecordingClassifier(**params).fit(np.repeat(X, 10, axis=1), y)
+    RecordingClassifier(validation_split=0.2, **params).fit(X, y)
+    assert fed_datasets == [True, False, False, False, False]
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+
+def _run(code):
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_tensorflow_not_imported():
+    """Creating, cloning and pickling unfitted estimators does not import
+    TensorFlow.
+    """
+    code = """
+import pickle
+import sys
+
+from sklearn.base import clone
+
+from scikeras.wrappers import KerasClassifier, KerasRegressor
+
+clf = KerasClassifier(model=None, model__hidden=3, loss=KerasRegressor.r_squared)
+clf.set_params(model__hidden=4)
+clone(clf).get_params()
+pickle.loads(pickle.dumps(clf)).get_meta()
+assert "tensorflow" not in sys.modules
+"""
+    _run(code)
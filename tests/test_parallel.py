@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+
+from joblib import Parallel, delayed, parallel_backend
+from sklearn.model_selection import GridSearchCV
+
+from scikeras.parallel import KerasLokyBackend
+from scikeras.wrappers import KerasClassifier
+
+from .mlp_models import dynamic_classifier
+
+
+def _worker_threads():
+    import tensorflow as tf
+
+    return (
+        tf.config.threading.get_intra_op_parallelism_threads(),
+        tf.config.threading.get_inter_op_parallelism_threads(),
+    )
+
+
+def test_worker_threads():
+    """Workers' TensorFlow thread pools are pinned."""
+    with parallel_backend("scikeras", n_jobs=2, inner_max_num_threads=1):
+        threads = Parallel()(delayed(_worker_threads)() for _ in range(4))
+    assert set(threads) == {(1, 1)}
+
+    backend = KerasLokyBackend(inter_op_threads=2, inner_max_num_threads=3)
+    with parallel_backend(backend, n_jobs=2):
+        threads = Parallel()(delayed(_worker_threads)() for _ in range(4))
+    assert set(threads) == {(3, 2)}
+
+
+def test_workers_reused():
+    """Workers persist across calls."""
+    with parallel_backend("scikeras", n_jobs=2):
+        first = set(Parallel()(delayed(os.getpid)() for _ in range(4)))
+    with parallel_backend("scikeras", n_jobs=2):
+        second = set(Parallel()(delayed(os.getpid)() for _ in range(4)))
+    assert first & second
+
+
+def test_grid_search():
+    """Hyperparameter searches run on the backend."""
+    X, y = np.random.uniform(size=(60, 4)), np.random.randint(0, 2, size=(60,))
+    clf = KerasClassifier(model=dynamic_classifier, model__hidden_layer_sizes=(10,))
+    params = {"model__hidden_layer_sizes": [(5,), (10,)]}
+    with parallel_backend("scikeras", n_jobs=2):
+        search = GridSearchCV(clf, params, cv=2).fit(X, y)
+    assert search.best_estimator_.predict(X).shape == y.shape
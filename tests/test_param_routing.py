@@ -1,4 +1,7 @@
+import gc
 import inspect
+import pickle
+import weakref
 
 from distutils.version import LooseVersion
 from typing import Any, Dict
@@ -9,6 +12,7 @@ import tensorflow as tf
 
 from tensorflow.keras import Model
 
+from scikeras._utils import RoutingTrie, get_build_fn_signature, route_params
 from scikeras.wrappers import BaseWrapper, KerasClassifier, KerasRegressor
 
 from .mlp_models import dynamic_classifier, dynamic_regressor
@@ -114,6 +118,83 @@ def test_no_extra_meta(wrapper_class, build_fn):
     assert set(clf.get_meta().keys()) == wrapper_class._meta - {"_user_params"}
 
 
+def test_get_meta_no_instantiation():
+    """Check that `get_meta` only instantiates the class once, to collect
+    the attributes set by `__init__`.
+    """
+    n_init = 0
+
+    class CountingRegressor(KerasRegressor):
+        def __init__(self, **kwargs):
+            nonlocal n_init
+            n_init += 1
+            super().__init__(**kwargs)
+            self._default_private = None
+
+    est = CountingRegressor(model=dynamic_regressor, model__hidden_layer_sizes=(10,))
+    est.fit(np.random.uniform(size=(10, 3)), np.random.uniform(size=(10,)))
+    n_init_fit = n_init
+    for _ in range(3):
+        meta = est.get_meta()
+    assert n_init == n_init_fit <= 2
+    assert "_default_private" not in meta
+    assert set(meta) == KerasRegressor._meta
+
+
+def test_build_fn_signature():
+    """Check that build function signatures are introspected once
+    and cached weakly.
+    """
+
+    def build_fn(hidden_layer_sizes, meta, compile_kwargs):
+        pass
+
+    def build_fn_kwargs(**kwargs):
+        pass
+
+    signature = get_build_fn_signature(build_fn)
+    assert signature == (True, True, False)
+    assert get_build_fn_signature(build_fn) is signature
+    assert get_build_fn_signature(build_fn_kwargs) == (True, True, True)
+
+    # bound methods share the entry of their function
+    est = KerasClassifier()
+    assert get_build_fn_signature(est.set_params) is get_build_fn_signature(
+        est.set_params
+    )
+
+    # the cache does not keep functions alive
+    ref = weakref.ref(build_fn)
+    del build_fn
+    gc.collect()
+    assert ref() is None
+
+
+def test_routing_trie():
+    """Check that `RoutingTrie` routes like `route_params`.
+    """
+    params = {
+        "optimizer": "sgd",
+        "optimizer__learning_rate": 0.1,
+        "metrics__name": "default",
+        "metrics__0__name": "first",
+        "metrics__0__param__0__foo": 1,
+        "metrics__out__1__name": "out",
+    }
+    trie = RoutingTrie(params)
+    for destination in ("optimizer", "metrics", "metrics__0", "metrics__out__1", "x"):
+        routed = route_params(params, destination=destination, pass_filter=set())
+        assert trie.route(destination).params == {
+            k: v for k, v in routed.items() if "__" not in k
+        }
+        for key, val in routed.items():
+            if "__" in key:
+                path, name = key.rsplit("__", 1)
+                assert trie.route(destination).route(path).params[name] is val
+    assert not trie.route("metrics", strict=True).children
+    assert trie.route("metrics", strict=True).params == {"name": "default"}
+
+
 def test_model_params_property():
     """Check that the `_model_params` property works as expected.
     """
@@ -149,3 +230,41 @@ def test_routed_unrouted_equivalence():
 
     clf = KerasClassifier(model=dynamic_classifier, hidden_layer_sizes=(100,))
     clf.fit(X, y)
+
+
+def test_routing_cache():
+    """Check that routed parameters are cached and that the cache
+    is invalidated when parameters are set.
+    """
+    n, d = 20, 3
+    n_classes = 3
+    X = np.random.uniform(size=(n, d)).astype(float)
+    y = np.random.choice(n_classes, size=n).astype(int)
+
+    clf = KerasClassifier(
+        model=dynamic_classifier, model__hidden_layer_sizes=(100,), batch_size=10
+    )
+    clf.fit(X, y)
+    assert "_routing_cache" in vars(clf)
+    pred_args = clf._get_routed_params("predict", BaseWrapper._predict_kwargs)
+    assert pred_args["batch_size"] == 10
+    # callers get a copy they can modify
+    pred_args["batch_size"] = 1
+    assert (
+        clf._get_routed_params("predict", BaseWrapper._predict_kwargs)["batch_size"]
+        == 10
+    )
+
+    # routed and unrouted parameters invalidate the cache
+    clf.set_params(predict__batch_size=5)
+    assert "_routing_cache" not in vars(clf)
+    pred_args = clf._get_routed_params("predict", BaseWrapper._predict_kwargs)
+    assert pred_args["batch_size"] == 5
+    clf.verbose = 0
+    assert (
+        clf._get_routed_params("predict", BaseWrapper._predict_kwargs)["verbose"] == 0
+    )
+
+    # the cache does not leak into meta parameters or pickles
+    assert "_routing_cache" not in clf.get_meta()
+    assert "_routing_cache" not in vars(pickle.loads(pickle.dumps(clf)))
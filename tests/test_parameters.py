@@ -1,3 +1,4 @@
+import gc
 import os
 
 import numpy as np
@@ -6,7 +7,13 @@ import pytest
 from sklearn.base import clone
 from tensorflow.python.keras.testing_utils import get_test_data
 
-from scikeras.wrappers import KerasClassifier, KerasRegressor
+from scikeras.wrappers import (
+    KerasClassifier,
+    KerasRegressor,
+    _model_cache,
+    clear_model_cache,
+    set_model_cache_size,
+)
 
 from .mlp_models import dynamic_classifier, dynamic_regressor
 
@@ -219,3 +226,122 @@ def test_build_fn_default_params():
     est = KerasClassifier(model=dynamic_classifier, model__hidden_layer_sizes=(200,))
     params = est.get_params()
     assert params["model__hidden_layer_sizes"] == (200,)
+
+
+class TestModelCache:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        # collect estimators from other tests, which return their models
+        gc.collect()
+        _model_cache.clear()
+        yield
+        gc.collect()
+        _model_cache.clear()
+
+    @pytest.mark.parametrize("optimizer", ["sgd", "adam", "adagrad"])
+    def test_reuse(self, optimizer):
+        """Models no longer in use are reused and reset to their initial state.
+        """
+        X, y = np.random.uniform(size=(50, 3)), np.random.uniform(size=(50,))
+        est = KerasRegressor(
+            model=dynamic_regressor,
+            model__hidden_layer_sizes=(10,),
+            optimizer=optimizer,
+            random_state=0,
+            model_cache=True,
+        )
+        y_pred = clone(est).fit(X, y).predict(X)
+        assert len(_model_cache) == 1
+
+        est.fit(X, y)
+        assert len(_model_cache) == 0
+        np.testing.assert_allclose(est.predict(X), y_pred, rtol=1e-5)
+        # the optimizer starts over from its config
+        assert int(est.model_.optimizer.iterations.numpy()) == 2
+        # refitting returns the model and takes it back
+        model = est.model_
+        est.set_params(epochs=2).fit(X, y)
+        assert est.model_ is model
+        assert len(_model_cache) == 0
+
+    def test_models_in_use(self):
+        """Models are only shared by estimators with the same architecture,
+        and never while in use.
+        """
+        X, y = np.random.uniform(size=(50, 3)), np.random.uniform(size=(50,))
+        est = KerasRegressor(
+            model=dynamic_regressor,
+            model__hidden_layer_sizes=(10,),
+            random_state=0,
+            model_cache=True,
+        )
+        est1 = clone(est).fit(X, y)
+        est2 = clone(est).fit(X, y)
+        assert est1.model_ is not est2.model_
+
+        model = est1.model_
+        del est1
+        est3 = clone(est).set_params(model__hidden_layer_sizes=(5,)).fit(X, y)
+        assert est3.model_ is not model
+        est4 = clone(est).fit(X[:20], y[:20])
+        assert est4.model_ is model
+
+    def test_not_cached(self):
+        """Models are not cached by default, without `random_state`
+        or when the build function can not be pickled.
+        """
+        X, y = np.random.uniform(size=(50, 3)), np.random.uniform(size=(50,))
+        KerasRegressor(model=dynamic_regressor, model__hidden_layer_sizes=(10,)).fit(
+            X, y
+        )
+        KerasRegressor(
+            model=dynamic_regressor, model__hidden_layer_sizes=(10,), model_cache=True
+        ).fit(X, y)
+        KerasRegressor(
+            model=lambda meta, compile_kwargs: dynamic_regressor(
+                (10,), meta, compile_kwargs
+            ),
+            random_state=0,
+            model_cache=True,
+        ).fit(X, y)
+        gc.collect()
+        assert len(_model_cache) == 0
+
+    def test_failed_build(self):
+        """The model in use is kept when building a new model fails."""
+        X, y = np.random.uniform(size=(50, 3)), np.random.uniform(size=(50,))
+        est = KerasRegressor(
+            model=dynamic_regressor,
+            model__hidden_layer_sizes=(10,),
+            random_state=0,
+            model_cache=True,
+        ).fit(X, y)
+        model = est.model_
+        est.set_params(model__hidden_layer_sizes=("bad",))
+        with pytest.raises((TypeError, ValueError)):
+            est.fit(X, y)
+        assert est.model_ is model
+        assert len(_model_cache) == 0
+        # another estimator can not take the model in use
+        est2 = clone(est).set_params(model__hidden_layer_sizes=(10,)).fit(X, y)
+        assert est2.model_ is not model
+
+    def test_size(self):
+        """The size of the cache can be changed and the cache cleared."""
+        X, y = np.random.uniform(size=(50, 3)), np.random.uniform(size=(50,))
+        est = KerasRegressor(model=dynamic_regressor, random_state=0, model_cache=True,)
+        try:
+            set_model_cache_size(1)
+            for sizes in [(10,), (5,)]:
+                clone(est).set_params(model__hidden_layer_sizes=sizes).fit(X, y)
+            gc.collect()
+            assert len(_model_cache) == 1
+            set_model_cache_size(0)
+            assert len(_model_cache) == 0
+        finally:
+            set_model_cache_size(16)
+        clone(est).set_params(model__hidden_layer_sizes=(10,)).fit(X, y)
+        gc.collect()
+        assert len(_model_cache) == 1
+        clear_model_cache()
+        assert len(_model_cache) == 0
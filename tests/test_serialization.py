@@ -4,15 +4,16 @@ from typing import Any, Dict
 
 import numpy as np
 import pytest
+import tensorflow as tf
 
 from sklearn.datasets import load_boston
 from tensorflow.python import keras
 from tensorflow.python.keras.layers import Dense, Input
 from tensorflow.python.keras.models import Model
 
-from scikeras.wrappers import KerasRegressor
+from scikeras.wrappers import KerasClassifier, KerasRegressor
 
-from .mlp_models import dynamic_regressor
+from .mlp_models import dynamic_classifier, dynamic_regressor
 
 
 def check_pickle(estimator, loader):
@@ -123,3 +124,67 @@ def test_run_eagerly():
         model__hidden_layer_sizes=(100,),
     )
     check_pickle(estimator, load_boston)
+
+
+@pytest.mark.skipif(
+    not hasattr(pickle, "PickleBuffer"), reason="requires pickle protocol 5"
+)
+def test_out_of_band_weights():
+    """With protocol 5, weights are pickled as a single out-of-band buffer.
+    """
+    X, y = np.random.uniform(size=(20, 3)), np.random.uniform(size=(20,))
+    estimator = KerasRegressor(
+        model=dynamic_regressor, model__hidden_layer_sizes=(10, 5),
+    ).fit(X, y)
+
+    buffers = []
+    serialized = pickle.dumps(estimator, protocol=5, buffer_callback=buffers.append)
+    assert len(buffers) == 1
+    weights = estimator.model_.get_weights()
+    assert buffers[0].raw().nbytes == sum(w.nbytes for w in weights)
+
+    deserialized = pickle.loads(serialized, buffers=buffers)
+    for w, w_new in zip(weights, deserialized.model_.get_weights()):
+        np.testing.assert_array_equal(w, w_new)
+    np.testing.assert_array_equal(estimator.predict(X), deserialized.predict(X))
+
+    # in-band
+    deserialized = pickle.loads(pickle.dumps(estimator, protocol=5))
+    np.testing.assert_array_equal(estimator.predict(X), deserialized.predict(X))
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_save_load(tmp_path, lazy):
+    """Estimators are saved to a directory and loaded back with their
+    Keras model, optionally loaded on first use.
+    """
+    X = np.random.uniform(size=(50, 3))
+    y = np.random.choice(["a", "b", "c"], size=(50,))
+    params = dict(model=dynamic_classifier, model__hidden_layer_sizes=(10,), verbose=0)
+    estimator = KerasClassifier(**params).fit(X, y)
+    estimator.save(str(tmp_path))
+
+    loaded = KerasClassifier.load(str(tmp_path), lazy=lazy, **params)
+    assert ("model_" in loaded.__dict__) is not lazy
+    assert loaded.get_params() == estimator.get_params()
+    np.testing.assert_array_equal(loaded.classes_, estimator.classes_)
+    assert loaded.n_features_in_ == estimator.n_features_in_
+    assert loaded.get_meta().keys() - {"model_"} == estimator.get_meta().keys() - {
+        "model_"
+    }
+    np.testing.assert_allclose(loaded.predict_proba(X), estimator.predict_proba(X))
+    assert "model_" in loaded.__dict__
+    for w, w_new in zip(estimator.model_.weights, loaded.model_.weights):
+        np.testing.assert_array_equal(w.numpy(), w_new.numpy())
+    # compiled, can be trained further
+    loaded.partial_fit(X, y)
+
+    # lazily loaded models are loaded before pickling
+    loaded = pickle.loads(pickle.dumps(KerasClassifier.load(str(tmp_path), lazy=True)))
+    np.testing.assert_allclose(loaded.predict_proba(X), estimator.predict_proba(X))
+
+    # the Keras model is saved in its native format
+    model = tf.keras.models.load_model(str(tmp_path / "model"))
+    np.testing.assert_allclose(
+        model.predict(X), estimator.model_.predict(X), rtol=1e-5,
+    )